@@ -0,0 +1,6 @@
+# ASGI entry point for an external server, one process per app:
+#   uvicorn asgi:application
+from secure_web import create_app
+from secure_web.asgi import create_asgi_app
+
+application = create_asgi_app(create_app())
@@ -0,0 +1,148 @@
+# Idle dashboard streams (/cctv/stream) held by one process: a thread per
+# connection, as under the threaded WSGI server, against the ASGI mode where
+# each connection is a coroutine. Reports memory per open connection and the
+# time for one status change to reach every connection. Each mode runs in
+# its own interpreter so the RSS numbers don't mix. No sockets are involved;
+# the WSGI and ASGI apps are called directly.
+#
+#   python benchmarks/bench_asgi_streams.py --connections 1000,10000 --threads-max 2000
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import create_app
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def wait_until(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.005)
+
+
+def flip(app):
+    from secure_web.cctv import get_cctv_registry
+    with app.app_context():
+        registry = get_cctv_registry()
+        registry.set_status(4, 'Online' if registry.get(4).status == 'Offline' else 'Offline')
+
+
+def run_threaded(app, n):
+    from werkzeug.test import EnvironBuilder
+    counts = {'open': 0, 'delta': 0}
+    lock = threading.Lock()
+
+    def connection():
+        environ = EnvironBuilder(path='/cctv/stream').get_environ()
+        for chunk in app(environ, lambda status, headers: None):
+            key = 'delta' if chunk.startswith(b'id:') else 'open'
+            with lock:
+                counts[key] += 1
+
+    before = rss_kb()
+    threads = [threading.Thread(target=connection, daemon=True) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: counts['open'] >= n)
+    memory = rss_kb() - before
+    started = time.perf_counter()
+    flip(app)
+    wait_until(lambda: counts['delta'] >= n)
+    return memory, time.perf_counter() - started
+
+
+def run_asgi(app, n):
+    from secure_web.asgi import AsgiApp
+    application = AsgiApp(app)
+    counts = {'open': 0, 'delta': 0}
+
+    async def main():
+        disconnect = asyncio.Event()
+
+        async def connection():
+            received = []
+
+            async def receive():
+                if not received:
+                    received.append(True)
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                body = message.get('body')
+                if body:
+                    counts['delta' if body.startswith(b'id:') else 'open'] += 1
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/cctv/stream', 'query_string': b'',
+                     'headers': [], 'http_version': '1.1', 'client': ('127.0.0.1', 40000)}
+            await application(scope, receive, send)
+
+        loop = asyncio.get_running_loop()
+        before = rss_kb()
+        tasks = [asyncio.ensure_future(connection()) for _ in range(n)]
+        while counts['open'] < n:
+            await asyncio.sleep(0.01)
+        memory = rss_kb() - before
+        started = time.perf_counter()
+        await loop.run_in_executor(None, flip, app)
+        while counts['delta'] < n:
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        return memory, elapsed
+
+    return asyncio.run(main())
+
+
+def child(mode, n):
+    # deliver each change at once instead of after the coalescing window
+    os.environ['CCTV_STREAM_WINDOW'] = '0'
+    os.chdir(tempfile.mkdtemp(prefix='bench-asgi-'))
+    app = create_app({'LOG_MODE': 'async'})
+    runner = run_threaded if mode == 'threads' else run_asgi
+    memory, elapsed = runner(app, n)
+    print(json.dumps({'memory_kb': memory, 'fanout_ms': elapsed * 1000}))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', default='1000,10000')
+    parser.add_argument('--threads-max', type=int, default=2000,
+                        help='skip the thread-per-connection mode above this many connections')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+
+    print(f'{"connections":>11} {"mode":>8} {"KB/conn":>8} {"fan-out ms":>11}')
+    for n in map(int, args.connections.split(',')):
+        for mode in ('threads', 'asgi'):
+            if mode == 'threads' and n > args.threads_max:
+                print(f'{n:>11} {mode:>8} {"-":>8} {"-":>11}')
+                continue
+            out = subprocess.run([sys.executable, __file__, '--child', mode, str(n)],
+                                 check=True, capture_output=True, text=True)
+            result = json.loads(out.stdout.splitlines()[-1])
+            print(f'{n:>11} {mode:>8} {result["memory_kb"] / n:>8.1f} {result["fanout_ms"]:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
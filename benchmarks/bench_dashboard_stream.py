@@ -0,0 +1,74 @@
+# Server-side cost of pushing a burst of camera status changes to N open
+# dashboards: every dashboard building its own update per change (counters,
+# region counters, JSON) against the shared feed, which builds one coalesced
+# delta per window and hands the same encoded message to every subscriber.
+#
+#   python benchmarks/bench_dashboard_stream.py --dashboards 10,100,1000 --burst 200
+import argparse
+import json
+
+from common import timeit
+from secure_web.cctv import CCTVRegistry, StatusFeed
+
+
+def make_fleet(n):
+    return CCTVRegistry({'id': i, 'name': f'Kamera {i}', 'status': 'Online', 'location': f'Jl. {i % 50}',
+                         'region': f'Wilayah {i % 10}'} for i in range(1, n + 1))
+
+
+def flip(registry, burst):
+    for camera_id in range(1, burst + 1):
+        registry.set_status(camera_id, 'Offline' if registry.get(camera_id).status == 'Online' else 'Online')
+
+
+def per_dashboard(registry, dashboards, burst):
+    outboxes = [[] for _ in range(dashboards)]
+
+    def listener(event):
+        for outbox in outboxes:
+            delta = {'counts': registry.counts(), 'regions': registry.region_counts(),
+                     'changes': event['changes']}
+            outbox.append(f'data: {json.dumps(delta)}\n\n')
+
+    registry.add_listener(listener)
+    flip(registry, burst)
+    registry.remove_listener(listener)
+    return sum(map(len, outboxes))
+
+
+def shared(registry, dashboards, burst):
+    feed = StatusFeed(registry, window=0)
+    subscriptions = [feed.hub.subscribe() for _ in range(dashboards)]
+    registry.add_listener(feed.on_change)
+    flip(registry, burst)
+    registry.remove_listener(feed.on_change)
+    # what the feed thread does once the window closes
+    changes, event = list(feed.pending.values()), feed.last_event
+    feed.pending = {}
+    feed.hub.publish(feed.message(changes, event))
+    return sum(s.queue.qsize() for s in subscriptions)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dashboards', default='10,100,1000')
+    parser.add_argument('--burst', type=int, default=200)
+    parser.add_argument('--cameras', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    registry = make_fleet(args.cameras)
+    print(f'{"dashboards":>10} {"per-dashboard ms":>17} {"msgs":>7} {"shared ms":>10} {"msgs":>6}')
+    for n in map(int, args.dashboards.split(',')):
+        counts = {}
+
+        def run(name, fn):
+            counts[name] = fn(registry, n, args.burst)
+
+        naive_ms = timeit(lambda: run('naive', per_dashboard), args.repeat)
+        shared_ms = timeit(lambda: run('shared', shared), args.repeat)
+        print(f'{n:>10} {naive_ms:>17.2f} {counts["naive"]:>7} {shared_ms:>10.2f} {counts["shared"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
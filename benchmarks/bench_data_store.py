@@ -0,0 +1,57 @@
+# Detail lookup and detail-page latency for each data backend, against the
+# old linear scan over a list of dicts.
+#
+#   python benchmarks/bench_data_store.py --sizes 10,10000,1000000
+import argparse
+import os
+import random
+import tempfile
+
+from common import create_app, timeit
+from secure_web.data import MemoryDataStore, MmapDataStore, SQLiteDataStore
+from secure_web.tokens import generate_token
+
+
+def make_records(n):
+    return [{'id': i, 'title': f'Data Rahasia {i}', 'content': f'Informasi penting tentang proyek {i}'}
+            for i in range(1, n + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,10000,1000000')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-data-')
+    os.chdir(workdir)
+    app = create_app()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'password123'})
+
+    print(f'{"records":>9} {"backend":>8} {"lookup us":>10} {"page ms":>8}')
+    for n in map(int, args.sizes.split(',')):
+        records = make_records(n)
+        stores = {
+            'scan': None,
+            'memory': MemoryDataStore(records),
+            'sqlite': SQLiteDataStore(os.path.join(workdir, f'data-{n}.db'), records),
+            'mmap': MmapDataStore.build(os.path.join(workdir, f'data-{n}.bin'), records),
+        }
+        with app.test_request_context():
+            tokens = {i: generate_token(i) for i in random.sample(range(1, n + 1), min(n, 50))}
+        ids = list(tokens)
+        for name, store in stores.items():
+            if store is None:
+                store = MemoryDataStore()
+                store.get = lambda record_id: next((d for d in records if d['id'] == record_id), None)
+            lookup = lambda: store.get(random.choice(ids))
+            repeat = args.repeat if name != 'scan' or n <= 10000 else 5
+            lookup_us = timeit(lookup, repeat) * 1000
+            app.extensions['secure_web']['data_store'] = store
+            page_ms = timeit(lambda: client.get(f'/data/detail/{tokens[random.choice(ids)]}'), min(repeat, 50))
+            print(f'{n:>9} {name:>8} {lookup_us:>10.2f} {page_ms:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
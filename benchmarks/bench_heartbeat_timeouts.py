@@ -0,0 +1,67 @@
+# Cost of one timeout sweep per second for a fleet where every camera sends
+# a heartbeat every --interval seconds and --silent percent have gone quiet:
+# scanning every online camera (the previous approach) against sweeping the
+# registry's timer wheel.
+#
+#   python benchmarks/bench_heartbeat_timeouts.py --cameras 1000,10000,100000
+import argparse
+import random
+import time
+
+import common  # noqa: F401 (puts the repository root on sys.path)
+from secure_web.cctv import CCTVRegistry
+
+
+def make_fleet(n):
+    return CCTVRegistry(({'id': i, 'name': f'Kamera {i}', 'status': 'Offline', 'location': f'Jl. {i % 50}',
+                          'region': f'Wilayah {i % 10}'} for i in range(1, n + 1)), heartbeat_timeout=90)
+
+
+def scan(registry, now):
+    deadline = now - registry.heartbeat_timeout
+    with registry.lock:
+        stale = [camera for camera in registry.by_status['Online'].values()
+                 if camera.last_seen is not None and camera.last_seen < deadline]
+        for camera in stale:
+            registry._set_status(camera, 'Offline')
+    return len(stale)
+
+
+def simulate(n, interval, silent, seconds, sweep):
+    registry = make_fleet(n)
+    start = time.time()
+    phase = {i: random.uniform(0, interval) for i in range(1, n + 1)}
+    quiet = set(random.sample(range(1, n + 1), n * silent // 100))
+    registry.apply_heartbeats({i: start for i in phase}, now=start)
+    samples = []
+    expired = 0
+    # simulated clock: one heartbeat batch and one sweep per second
+    for second in range(1, seconds + 1):
+        now = start + second
+        beats = {i: now for i, p in phase.items() if i not in quiet and (second + p) % interval < 1}
+        registry.apply_heartbeats(beats, now=now)
+        began = time.perf_counter()
+        expired += sweep(registry, now)
+        samples.append((time.perf_counter() - began) * 1000)
+    return sum(samples) / len(samples), expired
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cameras', default='1000,10000,100000')
+    parser.add_argument('--interval', type=int, default=30)
+    parser.add_argument('--silent', type=int, default=1, help='percent of cameras that stop reporting')
+    parser.add_argument('--seconds', type=int, default=120)
+    args = parser.parse_args()
+
+    print(f'{"cameras":>8} {"scan ms/s":>10} {"wheel ms/s":>11} {"expired":>8}')
+    for n in map(int, args.cameras.split(',')):
+        scan_ms, scan_expired = simulate(n, args.interval, args.silent, args.seconds, scan)
+        wheel_ms, wheel_expired = simulate(n, args.interval, args.silent, args.seconds,
+                                           lambda registry, now: registry.expire_heartbeats(now))
+        print(f'{n:>8} {scan_ms:>10.3f} {wheel_ms:>11.3f} {wheel_expired:>8}')
+        assert scan_expired == wheel_expired
+
+
+if __name__ == '__main__':
+    main()
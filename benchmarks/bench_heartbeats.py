@@ -0,0 +1,56 @@
+# Heartbeat ingest for a fleet of N cameras: one POST per camera against one
+# bulk NDJSON (and msgpack, when installed) request carrying every heartbeat.
+#
+#   python benchmarks/bench_heartbeats.py --cameras 100,1000,10000
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import create_app, timeit
+from secure_web.cctv import CCTVRegistry, msgpack
+
+TOKEN = 'bench-token'
+
+
+def make_fleet(n):
+    return CCTVRegistry({'id': i, 'name': f'Kamera {i}', 'status': 'Offline', 'location': f'Jl. {i % 50}',
+                         'region': f'Wilayah {i % 10}'} for i in range(1, n + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cameras', default='100,1000,10000')
+    parser.add_argument('--single-max', type=int, default=1000,
+                        help='time per-camera POSTs on a sample of this many cameras')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-heartbeats-'))
+    app = create_app({'CCTV_INGEST_TOKEN': TOKEN})
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+
+    def post(body, mimetype):
+        response = client.post('/api/cctv/heartbeats', data=body, content_type=mimetype, headers=headers)
+        assert response.status_code == 200, response.status_code
+
+    print(f'{"cameras":>8} {"single ms":>10} {"ndjson ms":>10} {"msgpack ms":>11}')
+    for n in map(int, args.cameras.split(',')):
+        app.extensions.setdefault('secure_web', {})['cctv_registry'] = make_fleet(n)
+        beats = [{'id': i, 'ts': time.time()} for i in range(1, n + 1)]
+        sample = beats[:args.single_max]
+        # per-camera cost measured on a sample and scaled to the fleet
+        single_ms = timeit(lambda: [post(json.dumps(b), 'application/x-ndjson') for b in sample], 1) * n / len(sample)
+        ndjson = '\n'.join(map(json.dumps, beats))
+        ndjson_ms = timeit(lambda: post(ndjson, 'application/x-ndjson'), args.repeat)
+        packed_ms = '-'
+        if msgpack is not None:
+            packed = msgpack.packb(beats)
+            packed_ms = f'{timeit(lambda: post(packed, "application/msgpack"), args.repeat):.2f}'
+        print(f'{n:>8} {single_ms:>10.2f} {ndjson_ms:>10.2f} {packed_ms:>11}')
+
+
+if __name__ == '__main__':
+    main()
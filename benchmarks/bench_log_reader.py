@@ -0,0 +1,65 @@
+# Compare the old readlines()-based /logs reader with the tail-seeking
+# reader and the persistent line index on log files of growing size.
+#
+#   python benchmarks/bench_log_reader.py --sizes 1M,10M,100M,1G,10G
+import argparse
+import os
+import tempfile
+
+from common import parse_size, timeit
+from secure_web.log_viewer import LogIndex, read_log_file
+
+LINE = (b'2026-01-11 13:07:26,027 - INFO - Login attempt - '
+        b'Username: admin - IP: 127.0.0.1\n')
+
+
+def make_log(path, size):
+    block = LINE * (1024 * 1024 // len(LINE))
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block)
+            written += len(block)
+
+
+def legacy_read(path, lines=50):
+    with open(path, 'r') as f:
+        return f.readlines()[-lines:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1M,10M,100M,1G,10G')
+    parser.add_argument('--legacy-max', default='1G',
+                        help='skip the readlines() reader above this size')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-log-')
+    os.chdir(workdir)
+    legacy_max = parse_size(args.legacy_max)
+
+    print(f'{"size":>8} {"readlines ms":>14} {"tail ms":>10} '
+          f'{"index build s":>14} {"index ms":>10}')
+    for label in args.sizes.split(','):
+        size = parse_size(label)
+        path = os.path.join(workdir, f'bench-{label}.log')
+        make_log(path, size)
+
+        legacy = '-'
+        if size <= legacy_max:
+            legacy = f'{timeit(lambda: legacy_read(path), 3):.2f}'
+        tail = timeit(lambda: read_log_file(50, path), args.repeat)
+
+        index = LogIndex(path)
+        build = timeit(index.update, 1) / 1000
+        indexed = timeit(lambda: index.tail_entries(50), args.repeat)
+
+        print(f'{label:>8} {legacy:>14} {tail:>10.3f} '
+              f'{build:>14.2f} {indexed:>10.3f}')
+        os.remove(path)
+        os.remove(index.index_path)
+
+
+if __name__ == '__main__':
+    main()
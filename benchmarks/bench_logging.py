@@ -0,0 +1,58 @@
+# Request throughput with the synchronous FileHandler versus the batching
+# queue handler (LOG_MODE=async), using concurrent test-client threads.
+# The routes hit only log and redirect, so template rendering doesn't hide
+# the cost of the handler.
+#
+#   python benchmarks/bench_logging.py --threads 8 --requests 2000
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from common import create_app
+
+
+def run(mode, threads, requests, overflow):
+    os.environ['LOG_OVERFLOW'] = overflow
+    from secure_web import logs
+    # the handler is installed once per process; drop the previous mode's
+    logging.getLogger().handlers.clear()
+    logs.log_handler = None
+    app = create_app({'LOG_MODE': mode})
+    per_thread = requests // threads
+
+    def worker():
+        client = app.test_client()
+        for i in range(per_thread):
+            client.get('/logout' if i % 2 else '/data')
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    logs.log_handler.flush()
+    stats = logs.log_pipeline_stats()
+    logs.log_handler.close()
+    return per_thread * threads / elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--overflow', default='block')
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-logging-'))
+    for mode in ('sync', 'async'):
+        rate, stats = run(mode, args.threads, args.requests, args.overflow)
+        print(f'{mode:>6}: {rate:8.0f} req/s  {stats}')
+
+
+if __name__ == '__main__':
+    main()
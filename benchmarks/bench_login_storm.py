@@ -0,0 +1,74 @@
+# Login storm: threads post wrong passwords as fast as they can while one
+# client keeps loading the dashboard. Reports logins/sec and dashboard p50/p99
+# for inline verification and for the verification pool at several sizes.
+# The login rate limiter is switched off, since it would answer nearly every
+# storm request with a 429 before any password is checked; 429s and 503s
+# are counted apart from verified logins.
+#
+#   python benchmarks/bench_login_storm.py --workers 0,2,4 --storm 16 --seconds 5
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from common import create_app
+from secure_web import auth
+
+
+def run(app, workers, storm, seconds):
+    auth.PASSWORD_WORKERS = workers
+    auth.password_pool = None
+    auth.password_slots = threading.BoundedSemaphore(max(workers, 0) + auth.PASSWORD_QUEUE)
+    stop = threading.Event()
+    counts = {'ok': 0, 'busy': 0, 'throttled': 0}
+    lock = threading.Lock()
+
+    def attacker():
+        client = app.test_client()
+        while not stop.is_set():
+            status = client.post('/login', data={'username': 'admin', 'password': 'wrong'}).status_code
+            with lock:
+                counts[{503: 'busy', 429: 'throttled'}.get(status, 'ok')] += 1
+
+    viewer = app.test_client()
+    viewer.post('/login', data={'username': 'admin', 'password': 'password123'})
+    threads = [threading.Thread(target=attacker, daemon=True) for _ in range(storm)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        viewer.get('/')
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return (counts['ok'] / seconds, counts['busy'] / seconds, counts['throttled'] / seconds,
+            statistics.median(latencies), p99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default='0,2,4')
+    parser.add_argument('--storm', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-login-'))
+    auth.LOGIN_LIMIT_IP = auth.LOGIN_LIMIT_USER = float('inf')
+    app = create_app()
+    print(f'hash: {auth.get_users()["admin"].split("$")[0]}, storm threads: {args.storm}')
+    print(f'{"workers":>8} {"logins/s":>9} {"busy/s":>7} {"429/s":>7} {"p50 ms":>7} {"p99 ms":>7}')
+    for workers in map(int, args.workers.split(',')):
+        logins, busy, throttled, p50, p99 = run(app, workers, args.storm, args.seconds)
+        print(f'{workers:>8} {logins:>9.1f} {busy:>7.1f} {throttled:>7.1f} {p50:>7.2f} {p99:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
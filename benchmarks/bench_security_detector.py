@@ -0,0 +1,81 @@
+# Throughput and memory of the security-event detector over a synthetic
+# audit.jsonl: --lines events, --warnings percent of them suspicious (failed
+# logins, bad tokens, denied pages) spread over --keys distinct users and
+# IPs, plus one brute-force IP and one token-abusing user that should be
+# flagged. Reports lines per second for a one-pass scan, the tracemalloc
+# peak while scanning the first --memory-lines lines (tracing is too slow
+# for the whole file), and the alerts raised. Memory should stay flat as
+# --keys grows.
+#
+#   python benchmarks/bench_security_detector.py --lines 1M --keys 1000,100000
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from common import parse_size
+from secure_web.security import SecurityDetector
+
+NORMAL = (('dashboard_view', 'success'), ('login', 'success'), ('data_list', 'success'))
+SUSPICIOUS = (('login', 'failure'), ('data_detail', 'invalid_token'), ('non_admin_access', 'denied'),
+              ('unauthorized_access', 'denied'))
+
+
+def write_log(path, lines, warnings, keys):
+    start = time.time() - lines // 100
+    with open(path, 'w') as f:
+        for i in range(lines):
+            k = random.randrange(keys)
+            user, ip = f'user{k}', f'10.{k >> 16 & 255}.{k >> 8 & 255}.{k & 255}'
+            if i % 50 == 0:
+                (event, outcome), user, ip = ('login', 'failure'), 'admin', '203.0.113.7'
+            elif i % 50 == 25:
+                (event, outcome), user = ('data_detail', 'invalid_token'), 'mallory'
+            elif random.randrange(100) < warnings:
+                event, outcome = random.choice(SUSPICIOUS)
+            else:
+                event, outcome = random.choice(NORMAL)
+            ts = datetime.fromtimestamp(start + i / 100).isoformat(timespec='milliseconds')
+            f.write(json.dumps({'ts': ts, 'event': event, 'user': user, 'ip': ip, 'path': '/login',
+                                'data_id': None, 'outcome': outcome, 'latency': 1.5}) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', default='1M')
+    parser.add_argument('--warnings', type=int, default=5, help='percent of lines that are suspicious')
+    parser.add_argument('--keys', default='1000,100000')
+    parser.add_argument('--memory-lines', default='100K')
+    args = parser.parse_args()
+    lines = parse_size(args.lines)
+    memory_lines = min(parse_size(args.memory_lines), lines)
+
+    print(f'{"keys":>8} {"lines/s":>10} {"peak KB":>8} {"events":>8} {"alerts":>7}  flagged')
+    for keys in map(int, args.keys.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'audit.jsonl')
+            sample = os.path.join(tmp, 'sample.jsonl')
+            write_log(path, lines, args.warnings, keys)
+            with open(path) as src, open(sample, 'w') as dst:
+                dst.writelines(line for _, line in zip(range(memory_lines), src))
+            tracemalloc.start()
+            SecurityDetector().scan(sample)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            detector = SecurityDetector()
+            started = time.perf_counter()
+            detector.scan(path)
+            elapsed = time.perf_counter() - started
+        stats = detector.stats()
+        planted = ('203.0.113.7', 'admin', 'mallory')
+        flagged = sorted({a['key'] for a in detector.recent_alerts() if a['key'] in planted})
+        print(f'{keys:>8} {lines / elapsed:>10.0f} {peak // 1024:>8} {stats["events"]:>8} '
+              f'{stats["alerts_raised"]:>7}  {", ".join(flagged)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Cold-start cost, each sample in a fresh interpreter: importing secure_web,
+# create_app(), and the first /login request (which builds only the
+# subsystems that page needs).
+#
+#   python benchmarks/bench_startup.py --repeat 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import secure_web
+imported = time.perf_counter()
+app = secure_web.create_app()
+created = time.perf_counter()
+app.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps([(imported - start) * 1000, (created - imported) * 1000, (served - created) * 1000]))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    samples = []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT)], cwd=workdir,
+                             check=True, capture_output=True, text=True, env=dict(os.environ))
+        samples.append(json.loads(out.stdout.splitlines()[-1]))
+    for i, label in enumerate(('import', 'create_app', 'first /login')):
+        print(f'{label:>13}: {statistics.median(s[i] for s in samples):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
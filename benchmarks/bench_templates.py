@@ -0,0 +1,58 @@
+# Render latency per page: render_template_string on the inline sources (the
+# old behaviour) versus rendering the preloaded templates by name.
+#
+#   python benchmarks/bench_templates.py --repeat 200
+import argparse
+import os
+import tempfile
+
+from flask import render_template, render_template_string, session
+
+from common import create_app, timeit
+from secure_web import templates
+from secure_web.cctv import cctv_locations, get_cctv_registry
+from secure_web.data import sensitive_data
+from secure_web.log_viewer import LOG_LEVELS, query_logs
+from secure_web.logs import LOG_PAGE_MAX
+from secure_web.tokens import generate_token
+
+
+def contexts():
+    logs, cursor = query_logs()
+    registry = get_cctv_registry()
+    return {
+        'dashboard.html': (templates.DASHBOARD_TEMPLATE, dict(
+            cctv_grid=registry.render_grid(
+                lambda cameras: render_template('cctv_grid.html', cctv_list=cameras)),
+            regions=registry.region_counts(), grid_filter={},
+            total_cctv=6, online_cctv=5, offline_cctv=1)),
+        'cctv_grid.html': (templates.CCTV_GRID_TEMPLATE, dict(cctv_list=cctv_locations)),
+        'login.html': (templates.LOGIN_TEMPLATE, {}),
+        'data.html': (templates.DATA_TEMPLATE, dict(
+            data_list=sensitive_data, generate_token=generate_token)),
+        'detail.html': (templates.DETAIL_TEMPLATE, dict(
+            data=sensitive_data[0], token=generate_token(1))),
+        'logs.html': (templates.LOG_TEMPLATE, dict(
+            logs=logs, next_cursor=cursor, filters={}, levels=LOG_LEVELS,
+            live=True, live_max_lines=LOG_PAGE_MAX)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-templates-'))
+    app = create_app()
+    print(f'{"template":>14} {"string ms":>10} {"registry ms":>12}')
+    with app.test_request_context('/'):
+        session['username'] = 'admin'
+        for name, (source, context) in contexts().items():
+            before = timeit(lambda: render_template_string(source, **context), args.repeat)
+            after = timeit(lambda: render_template(name, **context), args.repeat)
+            print(f'{name:>14} {before:>10.3f} {after:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
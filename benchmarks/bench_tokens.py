@@ -0,0 +1,48 @@
+# Token minting for a listing page: one serializer.dumps per row against the
+# batch minter, cold (new bucket) and warm (tokens cached). Then verification
+# of one hot detail token with and without the verified-token cache.
+#
+#   python benchmarks/bench_tokens.py --rows 50,1000,10000
+import argparse
+import os
+import tempfile
+
+from itsdangerous import URLSafeTimedSerializer
+
+from common import create_app, timeit
+from secure_web.tokens import TOKEN_MAX_AGE, TOKEN_SALT, generate_token, generate_tokens, \
+    get_token_service, token_cache_stats, verify_token
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='50,1000,10000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-tokens-'))
+    app = create_app()
+    app.app_context().push()
+    plain = URLSafeTimedSerializer(app.secret_key)
+
+    def cold(ids):
+        get_token_service().minted.clear()
+        generate_tokens(ids)
+
+    print(f'{"rows":>7} {"dumps ms":>9} {"cold ms":>8} {"warm ms":>8}')
+    for n in map(int, args.rows.split(',')):
+        ids = list(range(1, n + 1))
+        dumps_ms = timeit(lambda: [plain.dumps(i, salt=TOKEN_SALT) for i in ids], args.repeat)
+        cold_ms = timeit(lambda: cold(ids), args.repeat)
+        generate_tokens(ids)
+        warm_ms = timeit(lambda: generate_tokens(ids), args.repeat)
+        print(f'{n:>7} {dumps_ms:>9.3f} {cold_ms:>8.3f} {warm_ms:>8.3f}')
+
+    token = generate_token(1)
+    loads_us = timeit(lambda: plain.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE), 1000) * 1000
+    cached_us = timeit(lambda: verify_token(token), 1000) * 1000
+    print(f'verify: loads {loads_us:.2f} us, cached {cached_us:.2f} us, {token_cache_stats()}')
+
+
+if __name__ == '__main__':
+    main()
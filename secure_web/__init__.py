@@ -0,0 +1,55 @@
+import os
+
+from flask import Flask
+
+from .assets import asset_url
+from .audit import configure_audit_log
+from .cctv import CCTV_HEARTBEAT_TIMEOUT, CCTV_INGEST_TOKEN, CCTV_STATE_BACKEND, CCTV_STATE_PATH
+from .data import DATA_BACKEND, DATA_PATH
+from .logs import LOG_MODE, configure_logging
+from .security import SECURITY_DETECTOR
+from .sessions import SESSION_BACKEND, SESSION_PATH, ServerSessionInterface
+from .streams import STREAM_RETRY_SECONDS, STREAM_THREAD_LIMIT
+from .templates import TEMPLATE_PRECOMPILE_DIR, template_loader
+from .views import register_routes
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
+
+# Settings create_app() reads from app.config. Each defaults to the
+# environment variable of the same name; anything else in `config` is passed
+# through to Flask.
+def default_config():
+    return {
+        'SECRET_KEY': SECRET_KEY,
+        'LOG_MODE': LOG_MODE,
+        'DATA_BACKEND': DATA_BACKEND,
+        'DATA_PATH': DATA_PATH,
+        'SESSION_BACKEND': SESSION_BACKEND,
+        'SESSION_PATH': SESSION_PATH,
+        'TEMPLATE_PRECOMPILE_DIR': TEMPLATE_PRECOMPILE_DIR,
+        'CCTV_HEARTBEAT_TIMEOUT': CCTV_HEARTBEAT_TIMEOUT,
+        'CCTV_INGEST_TOKEN': CCTV_INGEST_TOKEN,
+        'CCTV_STATE_BACKEND': CCTV_STATE_BACKEND,
+        'CCTV_STATE_PATH': CCTV_STATE_PATH,
+        'SECURITY_DETECTOR': SECURITY_DETECTOR,
+        'STREAM_THREAD_LIMIT': STREAM_THREAD_LIMIT
+    }
+
+# Only cheap setup happens here: logging, the session interface, the
+# template loader and the routes. The data store, CCTV registry, log index
+# and catalog, token caches, password hashes and assets are built when a
+# request first needs them (or by the production server before it forks).
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    # before app.logger is first used, so Flask sees the root handler and adds none of its own
+    configure_logging(app.config['LOG_MODE'])
+    configure_audit_log(app.config['LOG_MODE'])
+    if app.config['SESSION_BACKEND'] != 'cookie':
+        app.session_interface = ServerSessionInterface(app.config['SESSION_BACKEND'], app.config['SESSION_PATH'])
+    app.jinja_env.loader = template_loader(app, app.config['TEMPLATE_PRECOMPILE_DIR'])
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['stream_retry'] = STREAM_RETRY_SECONDS * 1000
+    register_routes(app)
+    return app
@@ -0,0 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import asyncio
+import sys
+import io
+import os
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+from .server import SERVER_HOST, SERVER_PORT, SERVER_THREADS, create_wsgi_app, flush_log_handlers
+from .streams import EventStream, LoopRelay
+
+logger = logging.getLogger(__name__)
+
+# ASGI serving mode. Every route still runs in the Flask app, called as a
+# WSGI application on a pool of ASGI_THREADS threads. Responses whose body is
+# an EventStream (the live log and dashboard streams) are handed back to the
+# event loop instead, so an open stream costs a coroutine and a small queue
+# rather than a worker thread, and one process can hold many thousands of
+# idle streams. Request bodies are read in full before the app is called,
+# up to ASGI_MAX_BODY bytes.
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', SERVER_THREADS))
+ASGI_MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 16 * 1024 * 1024))
+
+def wsgi_environ(scope, body):
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.input_terminated': True,
+        # EventStream bodies are served on the event loop, not a pool thread
+        'secure_web.loop_streams': True
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    # the body has been read in full, so it has a length even if it came chunked
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    return environ
+
+class AsgiApp:
+    def __init__(self, app, threads=ASGI_THREADS):
+        self.app = app
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='asgi')
+        # one LoopRelay per stream source and event loop
+        self.relays = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.pool.shutdown(wait=True)
+                flush_log_handlers()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = b''
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            more = message.get('more_body', False)
+            if len(body) > ASGI_MAX_BODY:
+                await send({'type': 'http.response.start', 'status': 413, 'headers': []})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+        loop = asyncio.get_running_loop()
+        stream = await loop.run_in_executor(self.pool, self.call_app, wsgi_environ(scope, body), loop, send)
+        if stream is not None:
+            await self.stream(stream, loop, receive, send)
+
+    # Calls the app and sends its response from one pool thread: a streamed
+    # body may hold a request context, which belongs to the thread that
+    # started it. An EventStream body is returned to the loop instead.
+    def call_app(self, environ, loop, send):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start['status'] = int(status.split(' ', 1)[0])
+            start['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        app_iter = self.app(environ, start_response)
+        emit({'type': 'http.response.start', **start})
+        if isinstance(app_iter, EventStream):
+            return app_iter
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        return None
+
+    # Runs until the stream ends or the client goes away
+    async def stream(self, stream, loop, receive, send):
+        relay = self.relays.get((stream.source, loop))
+        if relay is None:
+            relay = self.relays[stream.source, loop] = LoopRelay(stream.source, loop)
+        task = asyncio.current_task()
+
+        def on_disconnect(watcher):
+            task.cancel()
+
+        watcher = asyncio.ensure_future(self.disconnected(receive))
+        watcher.add_done_callback(on_disconnect)
+        events = stream.events(relay)
+        try:
+            async for chunk in events:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except asyncio.CancelledError:
+            if not watcher.done():
+                raise
+        finally:
+            watcher.remove_done_callback(on_disconnect)
+            watcher.cancel()
+            await events.aclose()
+
+    @staticmethod
+    async def disconnected(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+# Preloads like the WSGI server, for a single process
+def create_asgi_app(app, threads=ASGI_THREADS):
+    return AsgiApp(create_wsgi_app(app, workers=1), threads)
+
+def serve_asgi(app, host=SERVER_HOST, port=SERVER_PORT, threads=ASGI_THREADS):
+    if uvicorn is None:
+        raise RuntimeError('ASGI mode needs an ASGI server: pip install uvicorn')
+    application = create_asgi_app(app, threads)
+    logger.info(f'Starting ASGI server on {host}:{port} - Threads: {threads}')
+    uvicorn.run(application, host=host, port=port, lifespan='on', log_config=None)
@@ -0,0 +1,56 @@
+from functools import lru_cache
+import hashlib
+import json
+import re
+import os
+
+from flask import url_for
+
+from .responses import COMPRESS_ENCODINGS, compress_body
+from .templates import APP_CSS, TEMPLATES
+
+# Static assets. Each bundle is minified once, on first use, and published as
+# <name>.<sha256 prefix>.<ext>; pages link to it through asset_url(), and the
+# response carries a year-long immutable Cache-Control and a strong ETag.
+ASSET_SOURCES = {
+    'app.css': (APP_CSS, 'text/css')
+}
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+def build_assets():
+    assets = {}
+    for name, (source, mimetype) in ASSET_SOURCES.items():
+        body = (minify_css(source) if mimetype == 'text/css' else source).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        stem, ext = os.path.splitext(name)
+        encoded = {None: body}
+        for encoding in COMPRESS_ENCODINGS:
+            encoded[encoding] = compress_body(body, encoding)
+        assets[name] = {'filename': f'{stem}.{digest}{ext}', 'encoded': encoded,
+                        'etag': digest, 'mimetype': mimetype}
+    return assets
+
+# Built on first use, once per process
+@lru_cache(maxsize=None)
+def get_assets():
+    return build_assets()
+
+@lru_cache(maxsize=None)
+def get_asset_files():
+    return {asset['filename']: asset for asset in get_assets().values()}
+
+def asset_url(name):
+    return url_for('asset', filename=get_assets()[name]['filename'])
+
+# Changes whenever a template or an asset does
+@lru_cache(maxsize=None)
+def template_version():
+    return hashlib.sha256(
+        json.dumps([TEMPLATES, [a['etag'] for a in get_assets().values()]], sort_keys=True).encode()
+    ).hexdigest()[:16]
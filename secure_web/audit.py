@@ -0,0 +1,153 @@
+import logging
+import logging.handlers
+from datetime import datetime
+import threading
+import atexit
+import glob
+import gzip
+import json
+import shutil
+import os
+
+from flask import g, request, session
+
+from .logs import BatchingLogHandler, LOG_COMPRESS_DELAY, LOG_MODE, log_file_replaced, log_rotation_lock
+
+# Secure #3: Structured audit trail (audit.jsonl). Every event is one JSON
+# object with the same fields, so consumers don't have to regex-parse app.log.
+# When the file reaches AUDIT_MAX_BYTES it is renamed to a timestamped segment
+# and compacted in the background into Parquet (zstd), or gzip when pyarrow
+# isn't installed. pyarrow is slow to import, so it is only loaded when a
+# segment is compacted or the archive is read.
+AUDIT_LOG_FILE = 'audit.jsonl'
+AUDIT_MAX_BYTES = int(os.environ.get('AUDIT_MAX_BYTES', 64 * 1024 * 1024))
+AUDIT_FIELDS = ('event', 'user', 'ip', 'path', 'data_id', 'outcome', 'latency')
+
+class AuditFormatter(logging.Formatter):
+    def format(self, record):
+        event = {'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')}
+        event.update(record.audit)
+        return json.dumps(event, ensure_ascii=False)
+
+class AuditLogHandler(logging.handlers.RotatingFileHandler):
+    def __init__(self, filename=AUDIT_LOG_FILE, max_bytes=AUDIT_MAX_BYTES):
+        super().__init__(filename, maxBytes=max_bytes, encoding='utf-8')
+        self.setFormatter(AuditFormatter())
+
+    # Worker processes share audit.jsonl; see log_rotation_lock()
+    def shouldRollover(self, record):
+        if self.stream is not None and log_file_replaced(self.stream, self.baseFilename):
+            # rotated by another worker
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        with log_rotation_lock(self.baseFilename):
+            rotate = self.stream is not None and not log_file_replaced(self.stream, self.baseFilename)
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            if rotate:
+                base, ext = os.path.splitext(self.baseFilename)
+                stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+                segment = f'{base}-{stamp}{ext}'
+                os.rename(self.baseFilename, segment)
+                compactor = threading.Timer(LOG_COMPRESS_DELAY, compact_audit_segment, args=(segment,))
+                compactor.name = 'audit-compactor'
+                compactor.daemon = True
+                compactor.start()
+            self.stream = self._open()
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+def audit_schema():
+    pyarrow = load_pyarrow()
+    return pyarrow.schema([
+        ('ts', pyarrow.timestamp('ms')),
+        ('event', pyarrow.string()),
+        ('user', pyarrow.string()),
+        ('ip', pyarrow.string()),
+        ('path', pyarrow.string()),
+        ('data_id', pyarrow.int64()),
+        ('outcome', pyarrow.string()),
+        ('latency', pyarrow.float64())
+    ])
+
+# Turn a rotated audit-*.jsonl segment into audit-*.parquet (or .jsonl.gz)
+def compact_audit_segment(segment):
+    base = os.path.splitext(segment)[0]
+    try:
+        pyarrow = load_pyarrow()
+        if pyarrow is not None:
+            columns = {name: [] for name in ('ts',) + AUDIT_FIELDS}
+            with open(segment, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    columns['ts'].append(datetime.fromisoformat(event['ts']))
+                    for name in AUDIT_FIELDS:
+                        columns[name].append(event.get(name))
+            table = pyarrow.table(columns, schema=audit_schema())
+            pyarrow.parquet.write_table(table, base + '.parquet.tmp', compression='zstd')
+            os.replace(base + '.parquet.tmp', base + '.parquet')
+        else:
+            with open(segment, 'rb') as src, gzip.open(base + '.jsonl.gz.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(base + '.jsonl.gz.tmp', base + '.jsonl.gz')
+        os.remove(segment)
+    except Exception as e:
+        logging.getLogger(__name__).error(f'Error compacting audit segment {segment}: {str(e)}')
+
+# Segments left behind by a process that exited mid-compaction
+def compact_pending_audit_segments():
+    base = os.path.splitext(AUDIT_LOG_FILE)[0]
+    for segment in sorted(glob.glob(f'{base}-*.jsonl')):
+        threading.Thread(target=compact_audit_segment, args=(segment,),
+                         name='audit-compactor', daemon=True).start()
+
+# Read the given columns of every compacted audit segment into one table.
+# Requires pyarrow.
+def read_audit_archive(columns=None):
+    pyarrow = load_pyarrow()
+    base = os.path.splitext(AUDIT_LOG_FILE)[0]
+    tables = [pyarrow.parquet.read_table(path, columns=columns)
+              for path in sorted(glob.glob(f'{base}-*.parquet'))]
+    if not tables:
+        return audit_schema().empty_table().select(columns or audit_schema().names)
+    return pyarrow.concat_tables(tables)
+
+audit_logger = logging.getLogger('audit')
+
+# Attach the audit.jsonl handler, once per process
+def configure_audit_log(mode=LOG_MODE):
+    if audit_logger.handlers:
+        return audit_logger
+    handler = AuditLogHandler()
+    if mode == 'async':
+        handler = BatchingLogHandler(handler)
+        atexit.register(handler.close)
+    audit_logger.setLevel(logging.INFO)
+    audit_logger.propagate = False
+    audit_logger.addHandler(handler)
+    compact_pending_audit_segments()
+    return audit_logger
+
+# Record an audit event for the current request. Events are written when
+# the response is ready, so latency covers the whole request (milliseconds).
+def audit(event, outcome='success', user=None, data_id=None):
+    g.setdefault('audit_events', []).append({
+        'event': event,
+        'user': user if user is not None else session.get('username'),
+        'ip': request.remote_addr,
+        'path': request.path,
+        'data_id': data_id,
+        'outcome': outcome,
+        'latency': None
+    })
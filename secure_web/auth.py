@@ -0,0 +1,226 @@
+from functools import wraps
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import threading
+import atexit
+import hashlib
+import hmac
+import base64
+import time
+import os
+
+from flask import current_app, flash, redirect, request, session, url_for
+
+from .audit import audit
+from .extensions import subsystem
+from .logs import log_value
+
+# Secure #2: Password hashing. PASSWORD_HASH picks the scheme for new hashes
+# (scrypt or pbkdf2); stored hashes carry their own parameters, so the cost
+# can be raised without invalidating existing ones.
+PASSWORD_HASH = os.environ.get('PASSWORD_HASH', 'scrypt')
+SCRYPT_N = int(os.environ.get('SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+# Verification runs in a pool of PASSWORD_WORKERS threads (or processes with
+# PASSWORD_POOL=process); 0 verifies inline in the request thread. At most
+# PASSWORD_QUEUE logins wait for a worker, the rest are turned away at once.
+PASSWORD_POOL = os.environ.get('PASSWORD_POOL', 'thread')
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_QUEUE = int(os.environ.get('PASSWORD_QUEUE', 32))
+PASSWORD_TIMEOUT = float(os.environ.get('PASSWORD_TIMEOUT', 10))
+
+def b64(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+# Encoded as scheme$params...$salt$hash, all base64 fields standard alphabet
+def hash_password(password, scheme=None):
+    scheme = scheme or PASSWORD_HASH
+    salt = os.urandom(16)
+    password = password.encode('utf-8')
+    if scheme == 'scrypt':
+        digest = hashlib.scrypt(password, salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+                                maxmem=256 * SCRYPT_N * SCRYPT_R, dklen=32)
+        return f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${b64(salt)}${b64(digest)}'
+    if scheme == 'pbkdf2':
+        digest = hashlib.pbkdf2_hmac('sha256', password, salt, PBKDF2_ITERATIONS)
+        return f'pbkdf2_sha256${PBKDF2_ITERATIONS}${b64(salt)}${b64(digest)}'
+    raise ValueError(f'Unknown password hash scheme: {scheme}')
+
+def check_password(encoded, password):
+    scheme, *fields = encoded.split('$')
+    password = password.encode('utf-8')
+    if scheme == 'scrypt':
+        n, r, p = map(int, fields[:3])
+        salt, expected = map(base64.b64decode, fields[3:])
+        digest = hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected))
+    elif scheme == 'pbkdf2_sha256':
+        salt, expected = map(base64.b64decode, fields[1:])
+        digest = hashlib.pbkdf2_hmac('sha256', password, salt, int(fields[0]), len(expected))
+    else:
+        return False
+    return hmac.compare_digest(digest, expected)
+
+# Dummy user database: username -> encoded hash from hash_password(). Only
+# the hashes are kept; a new one is made with e.g.
+#   python -c "from secure_web.auth import hash_password; print(hash_password('...'))"
+USER_PASSWORD_HASHES = {
+    'admin': 'scrypt$16384$8$1$1TkP2wu25fS4dTAKRPipkg==$lsmOq41EGhNPB4wGNMKi8fdd9sZLEl37ooXAXUNf7BU=',
+    'user1': 'scrypt$16384$8$1$8rqJ5p6QKq95gDjr8BRcgw==$8D+THILpRXnuEA/s3fEngAJpymfXby3qSedq161ilXc='
+}
+users = {}
+users_lock = threading.Lock()
+# Unknown usernames are checked against this, so they cost as much as a
+# wrong password. Hashing is slow on purpose, so it is made on the first
+# login instead of at import.
+dummy_password_hash = None
+
+def get_users():
+    global dummy_password_hash
+    with users_lock:
+        if not users:
+            dummy_password_hash = hash_password(os.urandom(16).hex())
+            users.update(USER_PASSWORD_HASHES)
+    return users
+
+# Secure #2: Login rate limit. Attempts per IP and failures per username are
+# counted over a sliding LOGIN_WINDOW; past the limit the login is refused
+# with 429 before any password is checked.
+LOGIN_WINDOW = int(os.environ.get('LOGIN_WINDOW', 60))
+LOGIN_LIMIT_IP = int(os.environ.get('LOGIN_LIMIT_IP', 30))
+LOGIN_LIMIT_USER = int(os.environ.get('LOGIN_LIMIT_USER', 10))
+LOGIN_SKETCH_WIDTH = int(os.environ.get('LOGIN_SKETCH_WIDTH', 16384))
+LOGIN_SKETCH_DEPTH = int(os.environ.get('LOGIN_SKETCH_DEPTH', 4))
+
+# Count-min sketch over two fixed windows, current and previous. The sliding
+# count is the current window plus the previous one weighted by how much of
+# it still overlaps the sliding window. Memory is 2 * width * depth counters
+# however many keys are seen; collisions can only overestimate.
+class SlidingWindowSketch:
+    def __init__(self, window, width=LOGIN_SKETCH_WIDTH, depth=LOGIN_SKETCH_DEPTH):
+        self.window = window
+        self.width = width
+        self.depth = depth
+        self.lock = threading.Lock()
+        self.index = None
+        self.current = self._empty()
+        self.previous = self._empty()
+
+    def _empty(self):
+        return array('I', bytes(4 * self.width * self.depth))
+
+    def _slots(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return [row * self.width + int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width
+                for row in range(self.depth)]
+
+    # Move the windows forward to `now`; returns the previous window's weight
+    def _advance(self, now):
+        index = int(now // self.window)
+        if index != self.index:
+            if self.index is not None and index == self.index + 1:
+                self.previous, self.current = self.current, self.previous
+                self.current[:] = self._empty()
+            else:
+                self.previous, self.current = self._empty(), self._empty()
+            self.index = index
+        return 1 - (now % self.window) / self.window
+
+    def add(self, key, now=None):
+        slots = self._slots(key)
+        with self.lock:
+            self._advance(time.time() if now is None else now)
+            for slot in slots:
+                if self.current[slot] < 0xFFFFFFFF:
+                    self.current[slot] += 1
+
+    def estimate(self, key, now=None):
+        slots = self._slots(key)
+        with self.lock:
+            weight = self._advance(time.time() if now is None else now)
+            return min(self.current[slot] + self.previous[slot] * weight for slot in slots)
+
+def get_login_attempts():
+    return subsystem('login_attempts', lambda app: SlidingWindowSketch(LOGIN_WINDOW))
+
+# Seconds until the login may be tried again, or 0 when it is allowed
+def login_throttled(ip, username):
+    login_attempts = get_login_attempts()
+    if login_attempts.estimate(f'ip:{ip}') >= LOGIN_LIMIT_IP:
+        return LOGIN_WINDOW
+    if username and login_attempts.estimate(f'user:{username}') >= LOGIN_LIMIT_USER:
+        return LOGIN_WINDOW
+    return 0
+
+password_pool = None
+password_pool_lock = threading.Lock()
+password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE)
+
+def get_password_pool():
+    global password_pool
+    with password_pool_lock:
+        if password_pool is None:
+            executor = ProcessPoolExecutor if PASSWORD_POOL == 'process' else ThreadPoolExecutor
+            password_pool = executor(max_workers=PASSWORD_WORKERS)
+            atexit.register(password_pool.shutdown, wait=False)
+        return password_pool
+
+# A forked child gets its own pool when it first needs one
+def reset_password_pool():
+    global password_pool, password_slots
+    password_pool = None
+    password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE)
+
+os.register_at_fork(after_in_child=reset_password_pool)
+
+# True/False for the credentials, None when the pool is saturated or too slow
+def verify_password(username, password):
+    users = get_users()
+    encoded = users.get(username, dummy_password_hash)
+    password = password or ''
+    if PASSWORD_WORKERS <= 0:
+        return check_password(encoded, password) and username in users
+    slots = password_slots
+    if not slots.acquire(blocking=False):
+        return None
+    try:
+        future = get_password_pool().submit(check_password, encoded, password)
+    except BaseException:
+        slots.release()
+        raise
+    # the slot is held until the hash finishes, even if this request gave up
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT) and username in users
+    except TimeoutError:
+        return None
+
+# Secure #2: Login Required Decorator
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'username' not in session:
+            current_app.logger.warning(f'Unauthorized access attempt to {log_value(request.path)} - IP: {request.remote_addr}')
+            audit('unauthorized_access', 'denied')
+            flash('Anda harus login terlebih dahulu!', 'danger')
+            return redirect(url_for('login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Admin Required Decorator
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'username' not in session:
+            current_app.logger.warning(f'Unauthorized access attempt to {log_value(request.path)} - IP: {request.remote_addr}')
+            audit('unauthorized_access', 'denied')
+            flash('Anda harus login sebagai admin!', 'danger')
+            return redirect(url_for('login'))
+        if session['username'] != 'admin':
+            current_app.logger.warning(f'Non-admin access attempt to {log_value(request.path)} - User: {session["username"]}')
+            audit('non_admin_access', 'denied')
+            flash('Akses ditolak! Hanya admin yang bisa mengakses halaman ini.', 'danger')
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    return decorated_function
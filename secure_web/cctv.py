@@ -0,0 +1,632 @@
+from contextlib import contextmanager
+import threading
+import sqlite3
+import json
+import time
+import sys
+import os
+
+from markupsafe import Markup
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .extensions import subsystem, track_fork
+from .streams import BroadcastHub, EventStream
+
+# CCTV data untuk dashboard
+cctv_locations = [
+    {'id': 1, 'name': 'Bundaran Waru', 'status': 'Online', 'location': 'Jl. Raya Waru', 'region': 'Waru'},
+    {'id': 2, 'name': 'Terminal Larangan', 'status': 'Online', 'location': 'Jl. Raya Larangan', 'region': 'Candi'},
+    {'id': 3, 'name': 'Alun-alun Sidoarjo', 'status': 'Online', 'location': 'Jl. Gajah Mada', 'region': 'Sidoarjo'},
+    {'id': 4, 'name': 'Pasar Porong', 'status': 'Offline', 'location': 'Jl. Raya Porong', 'region': 'Porong'},
+    {'id': 5, 'name': 'Delta Plaza', 'status': 'Online', 'location': 'Jl. Raya Candi', 'region': 'Candi'},
+    {'id': 6, 'name': 'Stadion Gelora Delta', 'status': 'Online', 'location': 'Jl. Pahlawan', 'region': 'Sidoarjo'}
+]
+
+CCTV_STATUSES = ('Online', 'Offline')
+
+# Cameras report liveness with heartbeats; a camera is Online while its
+# newest heartbeat is at most CCTV_HEARTBEAT_TIMEOUT seconds old. Cameras
+# that never sent one keep the status they were registered with.
+CCTV_HEARTBEAT_TIMEOUT = int(os.environ.get('CCTV_HEARTBEAT_TIMEOUT', 90))
+# Resolution and size of the heartbeat timer wheel. A camera goes Offline
+# within one tick of its deadline; deadlines further ahead than
+# tick * slots are still correct but get looked at once per rotation.
+CCTV_WHEEL_TICK = float(os.environ.get('CCTV_WHEEL_TICK', 1.0))
+CCTV_WHEEL_SLOTS = int(os.environ.get('CCTV_WHEEL_SLOTS', 512))
+# Bearer token the camera gateway sends to /api/cctv/heartbeats; ingest is
+# refused while it is unset
+CCTV_INGEST_TOKEN = os.environ.get('CCTV_INGEST_TOKEN')
+CCTV_INGEST_MAX_BYTES = int(os.environ.get('CCTV_INGEST_MAX_BYTES', 8 * 1024 * 1024))
+CCTV_INGEST_TYPES = ('application/x-ndjson', 'application/msgpack') if msgpack is not None \
+    else ('application/x-ndjson',)
+# Live dashboards: status changes are collected for CCTV_STREAM_WINDOW
+# seconds after the first one and pushed as a single delta
+CCTV_STREAM_WINDOW = float(os.environ.get('CCTV_STREAM_WINDOW', 0.5))
+CCTV_STREAM_KEEPALIVE = 15
+# Where camera statuses and heartbeats live:
+#   memory  in the registry of each process (default)
+#   sqlite  SQLite file at CCTV_STATE_PATH, shared by every worker process;
+#           each registry catches up with it before reading, and the live
+#           dashboard feed every CCTV_STATE_POLL seconds
+CCTV_STATE_BACKEND = os.environ.get('CCTV_STATE_BACKEND', 'memory')
+CCTV_STATE_PATH = os.environ.get('CCTV_STATE_PATH', 'cctv_state.db')
+CCTV_STATE_POLL = float(os.environ.get('CCTV_STATE_POLL', 1.0))
+
+# Hashed timer wheel. A deadline lands in the slot of its tick modulo the
+# wheel size, and each slot maps key -> deadline, so scheduling, resetting
+# and cancelling are O(1). advance() only opens the slots of ticks that have
+# completed since the last call, so a sweep costs the number of deadlines
+# falling due rather than the number of keys on the wheel.
+class TimerWheel:
+    def __init__(self, tick=CCTV_WHEEL_TICK, slots=CCTV_WHEEL_SLOTS, now=None):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.slot_of = {}
+        # first tick not swept yet
+        self.current = int((time.time() if now is None else now) // tick)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def schedule(self, key, deadline):
+        self.cancel(key)
+        index = max(int(deadline // self.tick), self.current) % len(self.slots)
+        self.slots[index][key] = deadline
+        self.slot_of[key] = index
+
+    def cancel(self, key):
+        index = self.slot_of.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    # Remove and return the keys whose deadline is before `now`. A gap longer
+    # than one rotation opens every slot once.
+    def advance(self, now):
+        target = int(now // self.tick)
+        due = []
+        for tick in range(max(self.current, target - len(self.slots)), target):
+            slot = self.slots[tick % len(self.slots)]
+            if not slot:
+                continue
+            expired = [key for key, deadline in slot.items() if deadline < now]
+            for key in expired:
+                del slot[key]
+                del self.slot_of[key]
+            due += expired
+        self.current = max(self.current, target)
+        return due
+
+    # Start of the next tick that advance() would sweep
+    def next_tick(self):
+        return (self.current + 1) * self.tick
+
+# One camera. __slots__ keeps each record to a fixed handful of pointers
+# instead of a per-camera dict, and the repeated status/location/region
+# strings are interned so every camera shares one copy of them.
+class Camera:
+    __slots__ = ('id', 'name', 'status', 'location', 'region', 'last_seen')
+
+    def __init__(self, id, name, status, location, region=None, last_seen=None):
+        self.id = id
+        self.name = name
+        self.status = sys.intern(status)
+        self.location = sys.intern(location)
+        self.region = sys.intern(region) if region is not None else None
+        self.last_seen = last_seen
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# Camera statuses shared between worker processes. Every write bumps `seq`
+# and stamps the rows it touched with it, so a registry catches up by reading
+# only the rows newer than the last seq it applied. `version` is the shared
+# registry version: it moves only when a status changes, the same in every
+# process.
+class SQLiteCCTVState:
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS camera_state (id INTEGER PRIMARY KEY, status TEXT, last_seen REAL, seq INTEGER);
+    CREATE INDEX IF NOT EXISTS camera_state_seq ON camera_state (seq);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        track_fork(self)
+        self._db().execute('PRAGMA journal_mode=WAL')
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.executescript(self.SCHEMA)
+            self.local.db = db
+        return db
+
+    def after_fork(self):
+        self.local = threading.local()
+
+    # The first registry to open the file sets the starting version
+    def start(self, version):
+        self._db().execute("INSERT OR IGNORE INTO meta VALUES ('seq', 0), ('version', ?)", (version,))
+
+    # (seq, version, [(id, status, last_seen)] written after `after`) from
+    # one snapshot; inside a write transaction when `db` is given
+    def read(self, after, db=None):
+        if db is not None:
+            return self._read(db, after)
+        db = self._db()
+        db.execute('BEGIN')
+        try:
+            return self._read(db, after)
+        finally:
+            db.execute('COMMIT')
+
+    @staticmethod
+    def _read(db, after):
+        meta = dict(db.execute('SELECT key, value FROM meta'))
+        rows = []
+        if meta['seq'] != after:
+            rows = db.execute('SELECT id, status, last_seen FROM camera_state WHERE seq > ?', (after,)).fetchall()
+        return meta['seq'], meta['version'], rows
+
+    # Serializes writers across processes
+    @contextmanager
+    def write(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    # Store the cameras' status and last heartbeat; returns the new seq
+    def save(self, db, cameras, version):
+        seq = db.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0] + 1
+        db.executemany('INSERT OR REPLACE INTO camera_state VALUES (?, ?, ?, ?)',
+                       [(camera.id, camera.status, camera.last_seen, seq) for camera in cameras])
+        db.executemany('UPDATE meta SET value = ? WHERE key = ?', ((seq, 'seq'), (version, 'version')))
+        return seq
+
+def open_cctv_state(backend=CCTV_STATE_BACKEND, path=CCTV_STATE_PATH):
+    if backend == 'memory':
+        return None
+    if backend == 'sqlite':
+        return SQLiteCCTVState(path)
+    raise ValueError(f'Unknown CCTV_STATE_BACKEND: {backend}')
+
+# CCTV registry. Cameras are indexed by id, status, location and region
+# (insertion-ordered dicts used as ordered sets), so lookups and filters
+# touch only the matching cameras. Online/offline totals come from the
+# status index and per-region online counters are updated as statuses
+# change. `version` moves only when a status actually changes; the rendered
+# camera grid is cached against it.
+#
+# Heartbeat deadlines sit on a timer wheel. A monitor thread, running while
+# any deadline is pending, sweeps it every tick, and readers sweep it too
+# before looking at statuses. Every batch of status changes is passed to the
+# registered listeners as one event with the new fleet counters.
+#
+# With a shared `state` (SQLiteCCTVState) every change is written through to
+# it inside its write transaction, after catching up with what other
+# processes wrote, and readers catch up before looking at statuses. Each
+# process keeps its own wheel; an expiry is only written if the heartbeat
+# is still too old after catching up.
+class CCTVRegistry:
+    def __init__(self, cameras=(), heartbeat_timeout=CCTV_HEARTBEAT_TIMEOUT, tick=CCTV_WHEEL_TICK, state=None):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.deadlines = TimerWheel(tick)
+        self.listeners = []
+        self.monitor = None
+        self.lock = threading.RLock()
+        self.by_id = {}
+        self.by_status = {status: {} for status in CCTV_STATUSES}
+        self.by_location = {}
+        self.by_region = {}
+        self.region_online = {}
+        self.version = 0
+        self.fragment = None
+        for camera in cameras:
+            self.add(camera if isinstance(camera, Camera) else Camera(**camera))
+        self.state = state
+        # last shared seq applied
+        self.synced = -1
+        if state is not None:
+            state.start(self.version)
+            self.sync()
+        track_fork(self)
+
+    # The monitor thread stays with the parent; a child starts its own with
+    # its first heartbeat, and the wheel is swept by readers until then
+    def after_fork(self):
+        self.lock = threading.RLock()
+        self.monitor = None
+
+    def _index(self, camera):
+        self.by_status[camera.status][camera.id] = camera
+        self.by_location.setdefault(camera.location, {})[camera.id] = camera
+        self.by_region.setdefault(camera.region, {})[camera.id] = camera
+        if camera.status == 'Online':
+            self.region_online[camera.region] = self.region_online.get(camera.region, 0) + 1
+
+    def _unindex(self, camera):
+        del self.by_status[camera.status][camera.id]
+        for index, key in ((self.by_location, camera.location), (self.by_region, camera.region)):
+            del index[key][camera.id]
+            if not index[key]:
+                del index[key]
+        if camera.status == 'Online':
+            self.region_online[camera.region] -= 1
+
+    def add(self, camera):
+        if camera.status not in CCTV_STATUSES:
+            raise ValueError(f'Unknown CCTV status: {camera.status}')
+        with self.lock:
+            if camera.id in self.by_id:
+                self._unindex(self.by_id[camera.id])
+            self.by_id[camera.id] = camera
+            self._index(camera)
+            self.version += 1
+
+    def get(self, camera_id):
+        return self.by_id.get(camera_id)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    # Returns True if the status changed
+    def set_status(self, camera_id, status):
+        if status not in CCTV_STATUSES:
+            raise ValueError(f'Unknown CCTV status: {status}')
+        with self.lock, self._shared() as db:
+            camera = self.by_id[camera_id]
+            if not self._set_status(camera, status):
+                return False
+            self._publish([camera], [camera], db)
+            return True
+
+    # listener(event) is called with the registry lock held, once per batch
+    # of changes, in version order; it must not block
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self.lock:
+            self.listeners.remove(listener)
+
+    def _emit(self, changed):
+        if not self.listeners:
+            return
+        event = {'version': self.version, 'counts': self.counts(),
+                 'changes': [{'id': camera.id, 'status': camera.status, 'region': camera.region}
+                             for camera in changed]}
+        for listener in self.listeners:
+            listener(event)
+
+    # Caller holds the lock and publishes the change
+    def _set_status(self, camera, status):
+        if camera.status == status:
+            return False
+        self._unindex(camera)
+        camera.status = sys.intern(status)
+        self._index(camera)
+        return True
+
+    # Caller holds the lock. Bumps the version if statuses changed, writes
+    # the touched cameras through to the shared state and notifies listeners.
+    def _publish(self, touched, changed, db=None):
+        if changed:
+            self.version += 1
+        if db is not None and touched:
+            self.synced = self.state.save(db, touched, self.version)
+        if changed:
+            self._emit(changed)
+
+    # Caller holds the lock. With shared state, runs the block inside its
+    # write transaction after catching up with the other processes; yields
+    # the connection, or None without shared state.
+    @contextmanager
+    def _shared(self):
+        if self.state is None:
+            yield None
+            return
+        with self.state.write() as db:
+            self._catch_up(self.state.read(self.synced, db))
+            yield db
+
+    # Catch up with the shared state, if there is one
+    def sync(self):
+        if self.state is None:
+            return
+        with self.lock:
+            self._catch_up(self.state.read(self.synced))
+
+    # Caller holds the lock
+    def _catch_up(self, snapshot):
+        seq, version, rows = snapshot
+        changed = []
+        for camera_id, status, last_seen in rows:
+            camera = self.by_id.get(camera_id)
+            if camera is None:
+                continue
+            camera.last_seen = last_seen
+            if status == 'Online' and last_seen is not None:
+                self.deadlines.schedule(camera_id, last_seen + self.heartbeat_timeout)
+            else:
+                self.deadlines.cancel(camera_id)
+            if self._set_status(camera, status):
+                changed.append(camera)
+        self.synced = seq
+        self.version = version
+        if changed:
+            self._emit(changed)
+        self._watch()
+
+    def _watch(self):
+        if self.deadlines and self.monitor is None:
+            self.monitor = threading.Thread(target=self._monitor, name='cctv-heartbeats', daemon=True)
+            self.monitor.start()
+
+    # Apply a batch of heartbeats ({camera_id: unix time}) in one pass under
+    # one lock acquisition. Heartbeats from the future count as now, older
+    # ones than the camera's last are ignored. Returns counts for the caller.
+    def apply_heartbeats(self, beats, now=None):
+        now = time.time() if now is None else now
+        accepted = unknown = 0
+        touched = []
+        changed = []
+        with self.lock, self._shared() as db:
+            for camera_id, seen in beats.items():
+                camera = self.by_id.get(camera_id)
+                if camera is None:
+                    unknown += 1
+                    continue
+                accepted += 1
+                seen = min(seen, now)
+                if camera.last_seen is not None and seen <= camera.last_seen:
+                    continue
+                camera.last_seen = seen
+                touched.append(camera)
+                if now - seen <= self.heartbeat_timeout:
+                    status = 'Online'
+                    self.deadlines.schedule(camera_id, seen + self.heartbeat_timeout)
+                else:
+                    status = 'Offline'
+                    self.deadlines.cancel(camera_id)
+                if self._set_status(camera, status):
+                    changed.append(camera)
+            self._publish(touched, changed, db)
+            self._watch()
+        return {'accepted': accepted, 'unknown': unknown, 'changed': len(changed)}
+
+    # Cameras whose heartbeat deadline has passed go Offline. Only the wheel
+    # slots of the ticks elapsed since the last sweep are opened. Readers
+    # call this before looking at statuses, so it also catches up with the
+    # shared state.
+    def expire_heartbeats(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.sync()
+            due = self.deadlines.advance(now)
+            if not due:
+                return 0
+            changed = []
+            with self._shared() as db:
+                for camera_id in due:
+                    camera = self.by_id[camera_id]
+                    # another process may have taken a newer heartbeat meanwhile
+                    if camera.last_seen is not None and camera.last_seen + self.heartbeat_timeout >= now:
+                        continue
+                    if self._set_status(camera, 'Offline'):
+                        changed.append(camera)
+                self._publish(changed, changed, db)
+        return len(changed)
+
+    def _monitor(self):
+        while True:
+            with self.lock:
+                if not self.deadlines:
+                    self.monitor = None
+                    return
+                wake = self.deadlines.next_tick()
+            time.sleep(max(wake - time.time(), 0))
+            self.expire_heartbeats()
+
+    # Cameras matching every given filter. Walks the smallest matching index
+    # instead of the whole fleet.
+    def find(self, status=None, location=None, region=None, limit=None):
+        with self.lock:
+            candidates = []
+            if status is not None:
+                candidates.append(self.by_status.get(status, {}))
+            if location is not None:
+                candidates.append(self.by_location.get(location, {}))
+            if region is not None:
+                candidates.append(self.by_region.get(region, {}))
+            if not candidates:
+                candidates.append(self.by_id)
+            smallest = min(candidates, key=len)
+            others = [c for c in candidates if c is not smallest]
+            result = []
+            for camera_id, camera in smallest.items():
+                if all(camera_id in other for other in others):
+                    result.append(camera)
+                    if limit is not None and len(result) >= limit:
+                        break
+            return result
+
+    def counts(self):
+        with self.lock:
+            total = len(self.by_id)
+            online = len(self.by_status['Online'])
+            return {'total': total, 'online': online, 'offline': total - online}
+
+    def region_counts(self):
+        with self.lock:
+            return [{'region': region, 'total': len(cameras), 'online': self.region_online.get(region, 0),
+                     'offline': len(cameras) - self.region_online.get(region, 0)}
+                    for region, cameras in sorted(self.by_region.items(), key=lambda item: str(item[0]))]
+
+    def locations(self):
+        with self.lock:
+            return sorted(self.by_location)
+
+    # HTML of the camera grid, rendered again only after a status change
+    def render_grid(self, render):
+        with self.lock:
+            version = self.version
+            if self.fragment is not None and self.fragment[0] == version:
+                return self.fragment[1]
+            cameras = list(self.by_id.values())
+        html = Markup(render(cameras))
+        with self.lock:
+            if self.version == version:
+                self.fragment = (version, html)
+        return html
+
+def get_cctv_registry():
+    return subsystem('cctv_registry', lambda app: CCTVRegistry(
+        cctv_locations, app.config['CCTV_HEARTBEAT_TIMEOUT'],
+        state=open_cctv_state(app.config['CCTV_STATE_BACKEND'], app.config['CCTV_STATE_PATH'])))
+
+# Status deltas for the live dashboards (/cctv/stream). The feed listens to
+# the registry and, once per coalescing window, builds one SSE message with
+# the latest status of each changed camera and the fleet and region
+# counters. The encoded message is published through a BroadcastHub, so the
+# work per burst is the same for one dashboard or a thousand. It runs while
+# at least one dashboard is connected.
+class StatusFeed:
+    def __init__(self, registry, window=CCTV_STREAM_WINDOW):
+        self.registry = registry
+        self.window = window
+        self.hub = BroadcastHub()
+        self.changed = threading.Condition()
+        self.pending = {}
+        self.last_event = None
+        self.thread = None
+        self.published = 0
+        track_fork(self)
+
+    # The feed thread stays with the parent; a child starts its own
+    def after_fork(self):
+        if self.on_change in self.registry.listeners:
+            self.registry.listeners.remove(self.on_change)
+        self.hub = BroadcastHub()
+        self.changed = threading.Condition()
+        self.pending = {}
+        self.thread = None
+
+    def subscribe(self, subscription=None):
+        subscription = self.hub.subscribe(subscription)
+        with self.hub.lock:
+            if self.thread is None:
+                self.registry.add_listener(self.on_change)
+                self.thread = threading.Thread(target=self._run, name='cctv-feed', daemon=True)
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.hub.unsubscribe(subscription)
+
+    # Registry listener, called with the registry lock held
+    def on_change(self, event):
+        with self.changed:
+            for change in event['changes']:
+                self.pending[change['id']] = change
+            self.last_event = event
+            self.changed.notify()
+
+    def _run(self):
+        while True:
+            with self.hub.lock:
+                if not self.hub.subscribers:
+                    self.registry.remove_listener(self.on_change)
+                    self.thread = None
+                    return
+            # changes written by other worker processes
+            self.registry.sync()
+            with self.changed:
+                if not self.changed.wait_for(lambda: self.pending, timeout=CCTV_STATE_POLL):
+                    continue
+            time.sleep(self.window)
+            with self.changed:
+                changes, self.pending = list(self.pending.values()), {}
+                event = self.last_event
+            self.hub.publish(self.message(changes, event))
+            self.published += 1
+
+    def message(self, changes, event):
+        regions = {change['region'] for change in changes}
+        delta = {'version': event['version'], 'counts': event['counts'], 'changes': changes,
+                 'regions': [r for r in self.registry.region_counts() if r['region'] in regions]}
+        return f'id: {event["version"]}\ndata: {json.dumps(delta)}\n\n'
+
+# Stream of one dashboard. `since` is the registry version the page was
+# rendered from; if the registry has moved on, or this connection missed a
+# delta, the page is told to reload instead of patching from an unknown state.
+class StatusEventStream(EventStream):
+    keepalive = CCTV_STREAM_KEEPALIVE
+    reload = 'event: reload\ndata: {}\n\n'
+
+    def __init__(self, feed, since=None):
+        super().__init__(feed)
+        self.since = since
+
+    def opening(self, subscription):
+        if self.since is not None and self.since != self.source.registry.version:
+            self.finished = True
+            return super().opening(subscription) + self.reload
+        return super().opening(subscription)
+
+    def render(self, message, subscription):
+        if subscription.dropped:
+            self.finished = True
+            return self.reload
+        return message
+
+def get_status_feed():
+    return subsystem('status_feed', lambda app: StatusFeed(get_cctv_registry()))
+
+def heartbeat_record(item):
+    if not isinstance(item, dict):
+        return None
+    camera_id, seen = item.get('id'), item.get('ts', time.time())
+    if type(camera_id) is not int or type(seen) not in (int, float):
+        return None
+    return camera_id, float(seen)
+
+# Heartbeats from a request body: NDJSON, one {"id": ..., "ts": ...} object
+# per line, or a msgpack stream of the same maps (arrays of maps are
+# flattened). "ts" is optional and defaults to the time of receipt. Repeated
+# ids collapse to their newest heartbeat. Returns ({id: ts}, invalid count);
+# a malformed msgpack stream raises ValueError.
+def read_heartbeats(stream, mimetype):
+    if mimetype == 'application/msgpack':
+        items = (item for chunk in msgpack.Unpacker(stream, raw=False)
+                 for item in (chunk if isinstance(chunk, list) else [chunk]))
+    else:
+        items = (ndjson_item(line) for line in stream if line.strip())
+    beats = {}
+    invalid = 0
+    for item in items:
+        record = heartbeat_record(item)
+        if record is None:
+            invalid += 1
+            continue
+        camera_id, seen = record
+        if seen > beats.get(camera_id, float('-inf')):
+            beats[camera_id] = seen
+    return beats, invalid
+
+def ndjson_item(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
@@ -0,0 +1,215 @@
+import threading
+import sqlite3
+import json
+import bisect
+import mmap
+import struct
+import os
+
+from .extensions import subsystem, track_fork
+from .tokens import generate_tokens
+
+# Dummy data
+sensitive_data = [
+    {'id': 1, 'title': 'Data Rahasia 1', 'content': 'Informasi penting tentang proyek A'},
+    {'id': 2, 'title': 'Data Rahasia 2', 'content': 'Informasi penting tentang proyek B'},
+    {'id': 3, 'title': 'Data Rahasia 3', 'content': 'Informasi penting tentang proyek C'}
+]
+
+# Storage for sensitive records, looked up by id. DATA_BACKEND picks the
+# backend; sqlite and mmap files are created from sensitive_data when they
+# don't exist yet:
+#   memory  dict keyed by id (default)
+#   sqlite  SQLite table keyed by id, shareable between worker processes
+#   mmap    read-only file with a sorted id index, memory-mapped so workers
+#           share the pages instead of each loading every record
+# Every backend offers get(id), list(after, limit) in id order, len() and a
+# `version` that changes when the records do.
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'memory')
+DATA_PATH = os.environ.get('DATA_PATH')
+DATA_PAGE_SIZE = 50
+DATA_PAGE_MAX = 500
+DATA_STREAM_CHUNK = 100
+DATA_STREAM_BUFFER = 64
+
+class MemoryDataStore:
+    def __init__(self, records=()):
+        self.records = {}
+        self.ids = []
+        self.version = 0
+        for record in records:
+            self.put(record)
+
+    def get(self, record_id):
+        return self.records.get(record_id)
+
+    def put(self, record):
+        if record['id'] not in self.records:
+            bisect.insort(self.ids, record['id'])
+        self.records[record['id']] = record
+        self.version += 1
+
+    def list(self, after=None, limit=None):
+        start = 0 if after is None else bisect.bisect_right(self.ids, after)
+        stop = len(self.ids) if limit is None else start + limit
+        return [self.records[record_id] for record_id in self.ids[start:stop]]
+
+    def __len__(self):
+        return len(self.records)
+
+class SQLiteDataStore:
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, title TEXT, content TEXT);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+    '''
+
+    def __init__(self, path, records=()):
+        self.path = path
+        self.local = threading.local()
+        track_fork(self)
+        db = self._db()
+        if records and not db.execute('SELECT 1 FROM records LIMIT 1').fetchone():
+            self.put_many(records)
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.executescript(self.SCHEMA)
+            self.local.db = db
+        return db
+
+    def after_fork(self):
+        self.local = threading.local()
+
+    def get(self, record_id):
+        row = self._db().execute('SELECT id, title, content FROM records WHERE id = ?', (record_id,)).fetchone()
+        return dict(row) if row else None
+
+    def put(self, record):
+        self.put_many([record])
+
+    def put_many(self, records):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('INSERT OR REPLACE INTO records VALUES (:id, :title, :content)', records)
+            db.execute("INSERT INTO meta VALUES ('version', 1) "
+                       "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def list(self, after=None, limit=None):
+        rows = self._db().execute('SELECT id, title, content FROM records WHERE id > ? ORDER BY id LIMIT ?',
+                                  (after if after is not None else -2 ** 63, limit if limit is not None else -1))
+        return [dict(row) for row in rows]
+
+    @property
+    def version(self):
+        row = self._db().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+# File layout: magic, record count, then one (id, offset, length) entry per
+# record sorted by id, then the records as UTF-8 JSON. get() binary-searches
+# the entries inside the mapping, so a lookup costs O(log n) page reads and
+# nothing is loaded up front.
+class MmapDataStore:
+    MAGIC = b'SECDATA1'
+    HEADER = struct.Struct('<8sQ')
+    ENTRY = struct.Struct('<qQQ')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f'Not a data file: {path}')
+        self.version = os.path.getmtime(path)
+
+    @classmethod
+    def build(cls, path, records):
+        records = sorted(records, key=lambda record: record['id'])
+        bodies = [json.dumps(record, ensure_ascii=False).encode('utf-8') for record in records]
+        offset = cls.HEADER.size + cls.ENTRY.size * len(records)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(records)))
+            for record, body in zip(records, bodies):
+                f.write(cls.ENTRY.pack(record['id'], offset, len(body)))
+                offset += len(body)
+            for body in bodies:
+                f.write(body)
+        os.replace(path + '.tmp', path)
+        return cls(path)
+
+    def _entry(self, i):
+        return self.ENTRY.unpack_from(self.map, self.HEADER.size + i * self.ENTRY.size)
+
+    # Index of the first entry whose id is greater than (or equal to) record_id
+    def _search(self, record_id, right=False):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_id = self._entry(mid)[0]
+            if entry_id < record_id or (right and entry_id == record_id):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _load(self, i):
+        _, offset, length = self._entry(i)
+        return json.loads(self.map[offset:offset + length])
+
+    def get(self, record_id):
+        i = self._search(record_id)
+        if i < self.count and self._entry(i)[0] == record_id:
+            return self._load(i)
+        return None
+
+    def list(self, after=None, limit=None):
+        start = 0 if after is None else self._search(after, right=True)
+        stop = self.count if limit is None else min(start + limit, self.count)
+        return [self._load(i) for i in range(start, stop)]
+
+    def __len__(self):
+        return self.count
+
+def open_data_store(backend=DATA_BACKEND, path=DATA_PATH, records=()):
+    if backend == 'memory':
+        return MemoryDataStore(records)
+    if backend == 'sqlite':
+        return SQLiteDataStore(path or 'data.db', records)
+    if backend == 'mmap':
+        path = path or 'data.bin'
+        if not os.path.exists(path):
+            return MmapDataStore.build(path, records)
+        return MmapDataStore(path)
+    raise ValueError(f'Unknown data backend: {backend}')
+
+def get_data_store():
+    return subsystem('data_store', lambda app: open_data_store(
+        app.config['DATA_BACKEND'], app.config['DATA_PATH'], records=sensitive_data))
+
+# Records after `after` in id order, fetched from the store DATA_STREAM_CHUNK
+# at a time so a streamed page never holds the whole listing. Each chunk's
+# tokens are minted in one batch.
+def iter_data_records(after=None, limit=None):
+    data_store = get_data_store()
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = DATA_STREAM_CHUNK if remaining is None else min(DATA_STREAM_CHUNK, remaining)
+        records = data_store.list(after, chunk)
+        generate_tokens([record['id'] for record in records])
+        yield from records
+        if len(records) < chunk:
+            return
+        after = records[-1]['id']
+        if remaining is not None:
+            remaining -= len(records)
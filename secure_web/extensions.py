@@ -0,0 +1,36 @@
+import os
+import threading
+import weakref
+
+from flask import current_app
+
+# Per-application subsystems (data store, log catalog, token caches, ...).
+# Each one is built by its factory the first time a request needs it and kept
+# in app.extensions['secure_web'], so an app that never serves a page doesn't
+# pay for it.
+subsystem_lock = threading.RLock()
+
+def subsystem(name, factory):
+    app = current_app._get_current_object()
+    state = app.extensions.setdefault('secure_web', {})
+    value = state.get(name)
+    if value is None:
+        with subsystem_lock:
+            value = state.get(name)
+            if value is None:
+                value = state[name] = factory(app)
+    return value
+
+# Threads and SQLite connections don't survive fork(). Objects holding them
+# register here and get after_fork() called in the child.
+fork_aware = weakref.WeakSet()
+
+def track_fork(obj):
+    fork_aware.add(obj)
+    return obj
+
+def reset_after_fork():
+    for obj in list(fork_aware):
+        obj.after_fork()
+
+os.register_at_fork(after_in_child=reset_after_fork)
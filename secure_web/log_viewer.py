@@ -0,0 +1,565 @@
+from functools import lru_cache
+from datetime import datetime
+from array import array
+import threading
+import sqlite3
+import fcntl
+import json
+import time
+import re
+import os
+
+from flask import current_app, request
+
+from .extensions import subsystem, track_fork
+from .logs import (LOG_FILE, LOG_INDEX_FILE, LOG_CATALOG_FILE, LOG_READ_BLOCK, LOG_PAGE_SIZE, LOG_PAGE_MAX,
+                   LOG_CATALOG_BATCH, LOG_QUERY_SCAN_LIMIT, LOG_STREAM_POLL, LOG_STREAM_KEEPALIVE,
+                   active_log_seq, log_position, log_segments, open_log_segment, split_log_position)
+from .streams import BroadcastHub, EventStream
+
+# Secure #3: Read the last lines of the log by seeking backwards from EOF in
+# blocks, so the cost depends on the number of lines and not on the file size.
+# Returns (byte offset, raw line) pairs, oldest first.
+def tail_log_entries(path, lines=50, end=None, block_size=LOG_READ_BLOCK):
+    with open(path, 'rb') as f:
+        return tail_file_entries(f, lines, end, block_size)
+
+def tail_file_entries(f, lines=50, end=None, block_size=LOG_READ_BLOCK):
+    size = f.seek(0, os.SEEK_END)
+    pos = size if end is None else min(end, size)
+    chunks = []
+    newlines = 0
+    # lines + 1 newlines guarantee the oldest line we keep is complete
+    while pos > 0 and newlines <= lines:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step)
+        newlines += chunk.count(b'\n')
+        chunks.append(chunk)
+    data = b''.join(reversed(chunks))
+    entries = []
+    start = 0
+    if pos > 0:
+        # the first chunk starts in the middle of a line
+        start = data.index(b'\n') + 1
+    while start < len(data):
+        nl = data.find(b'\n', start)
+        nl = len(data) if nl == -1 else nl + 1
+        entries.append((pos + start, data[start:nl]))
+        start = nl
+    return entries[-lines:] if lines else []
+
+# Secure #3: Last lines before a log position, walking back from the active
+# file into the rotated segments. Returns ((position, raw line) pairs oldest
+# first, position to continue from or None).
+def tail_log_positions(lines=50, before=None):
+    active = active_log_seq()
+    seq, end = split_log_position(before) if before is not None else (active, None)
+    older = [s for s in log_segments() if s < seq]
+    entries = []
+    while True:
+        need = lines - len(entries)
+        if seq == active:
+            raw = tail_log_entries(LOG_FILE, need, end) if os.path.exists(LOG_FILE) else []
+        else:
+            f = open_log_segment(seq)
+            raw = []
+            if f is not None:
+                with f:
+                    raw = tail_file_entries(f, need, end)
+        entries[:0] = [(log_position(seq, offset), line) for offset, line in raw]
+        more_here = bool(raw) and raw[0][0] > 0
+        if len(entries) >= lines or more_here:
+            break
+        if not older:
+            return entries, None
+        seq, end = older.pop(), None
+    if more_here or older:
+        return entries, entries[0][0]
+    return entries, None
+
+# Secure #3: Persistent byte-offset index of line starts (app.log.idx).
+# Entry i is the offset where line i starts and the last entry is the end of
+# the last complete line. Only bytes appended since the previous update are
+# scanned, and lookups read the entries they need from disk. Worker
+# processes share the file: an update holds an exclusive flock on it from
+# the size check to the append.
+class LogIndex:
+    def __init__(self, path=LOG_FILE, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + '.idx'
+        self.lock = threading.Lock()
+        self.count = 0
+        self.end = 0
+        self._load()
+
+    # Reads the count and end from disk. A trailing partial entry is left
+    # alone: another process may still be writing it.
+    def _load(self):
+        try:
+            size = os.path.getsize(self.index_path)
+        except OSError:
+            size = 0
+        if size < 8:
+            # created on the first update
+            self.count, self.end = 1, 0
+            return
+        size -= size % 8
+        with open(self.index_path, 'rb') as f:
+            f.seek(size - 8)
+            self.count = size // 8
+            self.end = array('Q', f.read(8))[0]
+
+    # Caller holds the flock on `f`
+    def _reset(self, f):
+        f.truncate(0)
+        f.write(array('Q', [0]).tobytes())
+        f.flush()
+        self.count = 1
+        self.end = 0
+
+    @property
+    def line_count(self):
+        return self.count - 1
+
+    # Index whatever was appended to the log since the last call and return
+    # the number of complete lines
+    def update(self):
+        with self.lock, open(self.index_path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            on_disk = os.fstat(f.fileno()).st_size
+            if on_disk < 8:
+                self._reset(f)
+            else:
+                if on_disk % 8:
+                    # left by a writer that died mid-append
+                    f.truncate(on_disk - on_disk % 8)
+                if on_disk // 8 != self.count:
+                    # another worker extended the index
+                    self._load()
+            if size < self.end:
+                # the log was truncated or replaced
+                self._reset(f)
+            if size == self.end:
+                return self.line_count
+            new = array('Q')
+            pos = self.end
+            with open(self.path, 'rb') as log:
+                log.seek(pos)
+                while pos < size:
+                    chunk = log.read(min(LOG_READ_BLOCK * 16, size - pos))
+                    if not chunk:
+                        break
+                    i = chunk.find(b'\n')
+                    while i != -1:
+                        new.append(pos + i + 1)
+                        i = chunk.find(b'\n', i + 1)
+                    pos += len(chunk)
+            if new:
+                f.write(new.tobytes())
+                f.flush()
+                self.count += len(new)
+                self.end = new[-1]
+            return self.line_count
+
+    def _offsets(self, start, stop):
+        offsets = array('Q')
+        with open(self.index_path, 'rb') as f:
+            f.seek(start * 8)
+            offsets.frombytes(f.read((stop - start) * 8))
+        return offsets
+
+    # Return (byte offset, raw line) pairs for lines [start, start + count)
+    def read_entries(self, start, count):
+        start = max(start, 0)
+        stop = min(start + count, self.line_count)
+        if stop <= start:
+            return []
+        offsets = self._offsets(start, stop + 1)
+        with open(self.path, 'rb') as f:
+            f.seek(offsets[0])
+            data = f.read(offsets[-1] - offsets[0])
+        base = offsets[0]
+        return [(offsets[i], data[offsets[i] - base:offsets[i + 1] - base])
+                for i in range(len(offsets) - 1)]
+
+    def tail_entries(self, lines=50):
+        total = self.update()
+        return self.read_entries(total - lines, lines)
+
+def get_log_index():
+    return subsystem('log_index', lambda app: LogIndex(LOG_FILE, LOG_INDEX_FILE))
+
+# Secure #3: Parse a line written with the
+# '%(asctime)s - %(levelname)s - %(message)s' format. Lines that don't match
+# (tracebacks, werkzeug banners) come back with level None.
+LOG_LINE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3} - ([A-Z]+) - (.*)', re.S)
+# The user and IP fields are read from the end of the message, where the
+# server writes them; anything the client sent comes before them, escaped
+# with log_value().
+LOG_USER_PATTERN = re.compile(r'\bUser(?:name)?: (\S+)(?: - (?:IP|Token): \S+)?$')
+LOG_IP_PATTERN = re.compile(r'\bIP: (\S+)(?: - User: \S+| - Guest)?$')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Lines written in the same second share a timestamp, and strptime is most of
+# the cost of parsing a line
+@lru_cache(maxsize=4096)
+def log_timestamp(stamp):
+    return datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S').timestamp()
+
+def parse_log_line(position, raw):
+    line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+    entry = {'position': position, 'time': None, 'ts': None, 'level': None,
+             'user': None, 'ip': None, 'message': line, 'line': line}
+    match = LOG_LINE_PATTERN.match(line)
+    if match:
+        stamp, level, message = match.groups()
+        user = LOG_USER_PATTERN.search(message)
+        ip = LOG_IP_PATTERN.search(message)
+        entry.update(
+            time=stamp,
+            ts=log_timestamp(stamp),
+            level=level,
+            message=message,
+            user=user.group(1) if user else None,
+            ip=ip.group(1) if ip else None
+        )
+    return entry
+
+LOG_CATALOG_VERSION = 2
+LOG_CATALOG_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    position INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL,
+    ts REAL,
+    level TEXT,
+    user TEXT,
+    ip TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_level ON entries (level, position);
+CREATE INDEX IF NOT EXISTS entries_user ON entries (user, position);
+CREATE INDEX IF NOT EXISTS entries_ip ON entries (ip, position);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+'''
+
+# Secure #3: Queryable catalog of log entries (app.log.db) covering the
+# active file and every rotated segment. The active file is fed from
+# LogIndex, so each update only parses the lines appended since the last
+# one; when the file is rotated, whatever was not catalogued yet is read from
+# the segment. Filtered queries walk the SQLite indexes newest-first using
+# the log position of the last entry seen as a keyset cursor.
+class LogCatalog:
+    def __init__(self, index, db_path=None):
+        self.index = index
+        self.db_path = db_path or index.path + '.db'
+        self.local = threading.local()
+        track_fork(self)
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            if db.execute('PRAGMA user_version').fetchone()[0] != LOG_CATALOG_VERSION:
+                db.executescript('DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS meta;')
+                db.execute(f'PRAGMA user_version = {LOG_CATALOG_VERSION}')
+            db.executescript(LOG_CATALOG_SCHEMA)
+            self.local.db = db
+        return db
+
+    def after_fork(self):
+        self.local = threading.local()
+
+    def _meta(self, db):
+        return dict(db.execute('SELECT key, value FROM meta').fetchall())
+
+    def _insert(self, db, seq, raw_entries, last):
+        rows = []
+        for offset, raw in raw_entries:
+            entry = parse_log_line(None, raw)
+            if entry['level'] is not None:
+                last = (entry['ts'], entry['level'])
+            # continuation lines inherit the time and level of the record they belong to
+            rows.append((log_position(seq, offset), len(raw), last[0], last[1], entry['user'], entry['ip']))
+        db.executemany('INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return last
+
+    # Catalogue the rest of a rotated segment
+    def _drain_segment(self, db, seq, last):
+        f = open_log_segment(seq)
+        if f is None:
+            return last
+        row = db.execute('SELECT MAX(position + length) FROM entries WHERE position >= ? AND position < ?',
+                         (log_position(seq, 0), log_position(seq + 1, 0))).fetchone()
+        start = split_log_position(row[0])[1] if row[0] is not None else 0
+        raw_entries = []
+        with f:
+            f.seek(start)
+            for raw in f:
+                raw_entries.append((start, raw))
+                start += len(raw)
+                if len(raw_entries) == LOG_CATALOG_BATCH:
+                    last = self._insert(db, seq, raw_entries, last)
+                    raw_entries = []
+        return self._insert(db, seq, raw_entries, last)
+
+    def update(self):
+        segments = log_segments()
+        active = max(segments) + 1 if segments else 1
+        total = self.index.update()
+        db = self._db()
+        meta = self._meta(db)
+        if meta.get('segment') == active and meta.get('lines') == total:
+            return
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            meta = self._meta(db)
+            seq = meta.get('segment', min(segments) if segments else active)
+            done = meta.get('lines', 0)
+            last = db.execute('SELECT ts, level FROM entries ORDER BY position DESC LIMIT 1').fetchone()
+            last = last or (None, None)
+            if seq < active:
+                # the file we were following has been rotated
+                for rotated in segments:
+                    if rotated >= seq:
+                        last = self._drain_segment(db, rotated, last)
+                seq, done = active, 0
+                total = self.index.update()
+            if done > total:
+                # the active file was truncated or replaced
+                db.execute('DELETE FROM entries WHERE position >= ?', (log_position(active, 0),))
+                done = 0
+            while done < total:
+                batch = self.index.read_entries(done, LOG_CATALOG_BATCH)
+                last = self._insert(db, active, batch, last)
+                done += len(batch)
+            if segments:
+                # entries of pruned segments can't be read any more
+                db.execute('DELETE FROM entries WHERE position < ?', (log_position(min(segments), 0),))
+            db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                           (('segment', active), ('lines', done)))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    # Return (entries newest first, next cursor). A page may come back short
+    # when the free-text filter is very selective; the cursor then resumes
+    # where the scan stopped.
+    def query(self, level=None, since=None, until=None, user=None, ip=None,
+              text=None, before=None, limit=LOG_PAGE_SIZE):
+        self.update()
+        clauses, params = [], []
+        for column, value in (('level', level), ('user', user), ('ip', ip)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('ts < ?')
+            params.append(until)
+        needle = text.lower() if text else None
+        batch = limit if needle is None else LOG_PAGE_MAX
+
+        db = self._db()
+        active = active_log_seq()
+        entries = []
+        scanned = 0
+        cursor = before
+        # the active file and any segment read so far, by segment number
+        files = {}
+        try:
+            while len(entries) < limit and scanned < LOG_QUERY_SCAN_LIMIT:
+                where = clauses + (['position < ?'] if cursor is not None else [])
+                sql = 'SELECT position, length, ts, level FROM entries'
+                if where:
+                    sql += ' WHERE ' + ' AND '.join(where)
+                sql += ' ORDER BY position DESC LIMIT ?'
+                rows = db.execute(sql, params + ([cursor] if cursor is not None else []) + [batch]).fetchall()
+                for position, length, ts, row_level in rows:
+                    scanned += 1
+                    cursor = position
+                    seq, offset = split_log_position(position)
+                    if seq not in files:
+                        files[seq] = open(self.index.path, 'rb') if seq == active else open_log_segment(seq)
+                    f = files[seq]
+                    if f is None:
+                        continue
+                    f.seek(offset)
+                    raw = f.read(length)
+                    entry = parse_log_line(position, raw)
+                    if needle is not None and needle not in entry['line'].lower():
+                        continue
+                    if entry['level'] is None:
+                        entry['ts'], entry['level'] = ts, row_level
+                    entries.append(entry)
+                    if len(entries) == limit:
+                        break
+                if len(rows) < batch and len(entries) < limit:
+                    return entries, None
+        finally:
+            for f in files.values():
+                if f is not None:
+                    f.close()
+        return entries, cursor
+
+def get_log_catalog():
+    return subsystem('log_catalog', lambda app: LogCatalog(get_log_index(), LOG_CATALOG_FILE))
+
+# Secure #3: Serve a page of log entries (oldest first within the page),
+# reading across the active file and the rotated segments. Unfiltered pages
+# are read straight from the end of the log; filtered ones go through the
+# catalog.
+def query_logs(level=None, since=None, until=None, user=None, ip=None,
+               text=None, before=None, limit=LOG_PAGE_SIZE):
+    if any((level, since, until, user, ip, text)):
+        entries, cursor = get_log_catalog().query(level, since, until, user, ip, text, before, limit)
+        entries.reverse()
+        return entries, cursor
+    raw, cursor = tail_log_positions(limit, before)
+    return [parse_log_line(position, line) for position, line in raw], cursor
+
+# (segment, size) of the active log file, which changes with every new
+# line. Lines whose message is `skip` at the end of the file (at most
+# LOG_PAGE_MAX of them) are left out of the size.
+def log_tail_state(skip=None):
+    try:
+        size = os.path.getsize(LOG_FILE)
+    except OSError:
+        size = 0
+    if skip is not None and size:
+        for offset, raw in reversed(tail_log_entries(LOG_FILE, LOG_PAGE_MAX, size)):
+            if parse_log_line(None, raw)['message'] != skip:
+                break
+            size = offset
+    return active_log_seq(), size
+
+# Read the /logs filters from the query string. Raises ValueError on
+# malformed values.
+def log_filters_from_request():
+    args = request.args
+    filters = {}
+    level = args.get('level', '').upper()
+    if level:
+        if level not in LOG_LEVELS:
+            raise ValueError(f'Unknown level: {level}')
+        filters['level'] = level
+    for key in ('since', 'until'):
+        if args.get(key):
+            filters[key] = datetime.fromisoformat(args[key]).timestamp()
+    for key in ('user', 'ip', 'text'):
+        if args.get(key, '').strip():
+            filters[key] = args[key].strip()
+    if args.get('cursor'):
+        filters['before'] = int(args['cursor'])
+    filters['limit'] = min(max(int(args.get('limit', LOG_PAGE_SIZE)), 1), LOG_PAGE_MAX)
+    return filters
+
+# Function to read log file
+def read_log_file(lines=50, path=None):
+    try:
+        if path is not None:
+            if not os.path.exists(path):
+                return []
+            raw = tail_log_entries(path, lines)
+        else:
+            raw, _ = tail_log_positions(lines)
+        return [line.decode('utf-8', 'replace') for _, line in raw]
+    except Exception as e:
+        current_app.logger.error(f'Error reading log file: {str(e)}')
+        return []
+
+# Secure #3: Follows app.log like tail -f for /logs/stream. A single thread
+# polls the file offset and publishes each batch of new lines once, however
+# many viewers are connected. It starts with the first viewer, stops after
+# the last one leaves, and keeps reading the old file handle across a
+# rotation before switching to the new app.log. Each line is turned into
+# an item by `parse` (parse_log_line(position, raw) by default).
+class LogFollower:
+    def __init__(self, path=LOG_FILE, hub=None, interval=LOG_STREAM_POLL, parse=parse_log_line):
+        self.path = path
+        self.parse = parse
+        self.hub = hub or BroadcastHub()
+        self.interval = interval
+        self.thread = None
+        track_fork(self)
+
+    # The polling thread stays with the parent; a child starts its own
+    def after_fork(self):
+        self.hub = BroadcastHub()
+        self.thread = None
+
+    def subscribe(self, subscription=None):
+        subscription = self.hub.subscribe(subscription)
+        with self.hub.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='log-follower', daemon=True)
+                self.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.hub.unsubscribe(subscription)
+
+    def _open(self, at_end):
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return None
+        if at_end:
+            f.seek(0, os.SEEK_END)
+        return f
+
+    def _run(self):
+        f = self._open(at_end=True)
+        partial = b''
+        try:
+            while True:
+                with self.hub.lock:
+                    if not self.hub.subscribers:
+                        self.thread = None
+                        return
+                lines = []
+                if f is not None:
+                    data = partial + f.read()
+                    lines, partial = self._split(data)
+                    try:
+                        rotated = os.stat(self.path).st_ino != os.fstat(f.fileno()).st_ino
+                    except OSError:
+                        rotated = True
+                    if rotated:
+                        # drain what was written before the rename, then follow the new file
+                        more, partial = self._split(partial + f.read())
+                        lines += more + ([partial] if partial else [])
+                        partial = b''
+                        f.close()
+                        f = self._open(at_end=False)
+                else:
+                    f = self._open(at_end=False)
+                if lines:
+                    self.hub.publish([self.parse(None, line) for line in lines])
+                time.sleep(self.interval)
+        finally:
+            if f is not None:
+                f.close()
+
+    @staticmethod
+    def _split(data):
+        end = data.rfind(b'\n') + 1
+        return data[:end].splitlines(), data[end:]
+
+class LogEventStream(EventStream):
+    keepalive = LOG_STREAM_KEEPALIVE
+
+    def render(self, batch, subscription):
+        entries = [{'level': e['level'], 'line': e['line']} for e in batch]
+        return f'data: {json.dumps(entries)}\n\n'
+
+def get_log_follower():
+    return subsystem('log_follower', lambda app: LogFollower())
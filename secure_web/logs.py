@@ -0,0 +1,516 @@
+import logging
+import logging.handlers
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from bisect import bisect_right
+from datetime import datetime
+from array import array
+import threading
+import atexit
+import fcntl
+import gzip
+import io
+import re
+import os
+
+from .extensions import track_fork
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Secure #3: Logging Configuration
+LOG_FILE = 'app.log'
+LOG_INDEX_FILE = LOG_FILE + '.idx'
+LOG_CATALOG_FILE = LOG_FILE + '.db'
+LOG_READ_BLOCK = 64 * 1024
+LOG_PAGE_SIZE = 50
+LOG_PAGE_MAX = 500
+LOG_CATALOG_BATCH = 10000
+LOG_QUERY_SCAN_LIMIT = 50000
+LOG_STREAM_POLL = float(os.environ.get('LOG_STREAM_POLL', 0.5))
+LOG_STREAM_KEEPALIVE = 15
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Values sent by the client (usernames, paths, tokens) are logged with
+# control characters, non-ASCII and spaces escaped, so they can't start a
+# new line or pass for a ' - IP: ...' field of the real one
+def log_value(value):
+    return str(value).encode('unicode_escape').decode('ascii').replace(' ', '\\x20')
+
+# app.log is rotated when it reaches LOG_MAX_BYTES or its first record is
+# LOG_ROTATE_SECONDS old (0 disables either check). Rotated segments are
+# app.log.000001, app.log.000002, ... compressed with LOG_COMPRESSION (gzip
+# or zstd) in independent frames of about LOG_SEGMENT_FRAME bytes of whole
+# lines, so a read only decompresses the frames it touches.
+# LOG_RETENTION keeps only the newest N segments; 0 keeps all of them.
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 50 * 1024 * 1024))
+LOG_ROTATE_SECONDS = int(os.environ.get('LOG_ROTATE_SECONDS', 24 * 60 * 60))
+LOG_COMPRESSION = os.environ.get('LOG_COMPRESSION', 'gzip')
+LOG_RETENTION = int(os.environ.get('LOG_RETENTION', 0))
+LOG_SEGMENT_FRAME = int(os.environ.get('LOG_SEGMENT_FRAME', 1024 * 1024))
+LOG_SEGMENT_CACHE = 8  # decompressed frames kept per process
+# Seconds a rotated file is left alone before it is compressed, so a worker
+# that was mid-write when another one rotated can still finish its line
+LOG_COMPRESS_DELAY = 1.0
+# A log position packs (segment, byte offset) into one sortable integer
+LOG_OFFSET_BITS = 40
+
+# LOG_MODE=async moves file writes off the request thread
+LOG_MODE = os.environ.get('LOG_MODE', 'sync')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_OVERFLOW = os.environ.get('LOG_OVERFLOW', 'block')  # block, drop-oldest or sample
+LOG_SAMPLE_RATE = int(os.environ.get('LOG_SAMPLE_RATE', 10))
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 256))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 0.5))
+
+# Secure #3: Queue-based handler. Request threads only append the record to
+# a bounded queue; a background writer formats records in batches and writes
+# each batch to the target handler's stream with a single write and flush,
+# either when LOG_BATCH_SIZE records are waiting or every LOG_FLUSH_INTERVAL.
+# When the queue is full the overflow policy decides what happens:
+#   block        wait for the writer to make room
+#   drop-oldest  discard the oldest queued record
+#   sample       keep one in every LOG_SAMPLE_RATE overflowing records
+#                (replacing the oldest one) and drop the rest
+class BatchingLogHandler(logging.Handler):
+    OVERFLOW_POLICIES = ('block', 'drop-oldest', 'sample')
+
+    def __init__(self, target, capacity=LOG_QUEUE_SIZE, overflow=LOG_OVERFLOW,
+                 batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 sample_rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy: {overflow}')
+        self.target = target
+        self.capacity = capacity
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = max(sample_rate, 1)
+        self.queue = deque()
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+        self.drained = threading.Condition(self.mutex)
+        self.closing = False
+        self.writing = False
+        self.overflowed = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.max_depth = 0
+        self._start_writer()
+        track_fork(self)
+
+    def _start_writer(self):
+        self.writer = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self.writer.start()
+
+    # A forked child has no writer thread and may have copied the mutex while
+    # it was held. Records still queued belong to the parent, which writes them.
+    def after_fork(self):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+        self.drained = threading.Condition(self.mutex)
+        self.queue.clear()
+        self.writing = False
+        self._start_writer()
+
+    # Skip the per-handler lock logging.Handler.handle() takes around emit();
+    # the queue has its own mutex and it is only held for the append
+    def handle(self, record):
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        with self.mutex:
+            if len(self.queue) >= self.capacity:
+                if self.overflow == 'block':
+                    while len(self.queue) >= self.capacity and not self.closing:
+                        self.not_full.wait()
+                else:
+                    self.overflowed += 1
+                    self.dropped += 1
+                    if self.overflow == 'sample' and self.overflowed % self.sample_rate:
+                        return
+                    self.queue.popleft()
+            self.queue.append(record)
+            depth = len(self.queue)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            if depth >= self.batch_size:
+                self.not_empty.notify()
+
+    def _run(self):
+        while True:
+            with self.mutex:
+                if len(self.queue) < self.batch_size and not self.closing:
+                    self.not_empty.wait(self.flush_interval)
+                batch = list(self.queue)
+                self.queue.clear()
+                self.writing = bool(batch)
+                self.not_full.notify_all()
+                if not batch:
+                    self.drained.notify_all()
+                    if self.closing:
+                        return
+                    continue
+            self._write(batch)
+            with self.mutex:
+                self.writing = False
+                self.written += len(batch)
+                self.batches += 1
+                if not self.queue:
+                    self.drained.notify_all()
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.target.format(record) + self.target.terminator)
+            except Exception:
+                self.handleError(record)
+        self.target.acquire()
+        try:
+            if isinstance(self.target, logging.handlers.BaseRotatingHandler) and \
+                    self.target.shouldRollover(batch[0]):
+                self.target.doRollover()
+            if self.target.stream is None:
+                self.target.stream = self.target._open()
+            self.target.stream.write(''.join(lines))
+            self.target.stream.flush()
+        except Exception:
+            self.handleError(batch[-1])
+        finally:
+            self.target.release()
+
+    # Wait until every queued record has been written
+    def flush(self):
+        with self.mutex:
+            self.not_empty.notify()
+            while (self.queue or self.writing) and self.writer.is_alive():
+                self.drained.wait(self.flush_interval)
+
+    def close(self):
+        with self.mutex:
+            self.closing = True
+            self.not_empty.notify()
+            self.not_full.notify_all()
+        self.writer.join()
+        self.target.close()
+        super().close()
+
+    def stats(self):
+        with self.mutex:
+            return {
+                'mode': 'async',
+                'overflow': self.overflow,
+                'capacity': self.capacity,
+                'depth': len(self.queue),
+                'max_depth': self.max_depth,
+                'dropped': self.dropped,
+                'written': self.written,
+                'batches': self.batches
+            }
+
+# Secure #3: Rotated log segments
+LOG_SEGMENT_PATTERN = re.compile(re.escape(os.path.basename(LOG_FILE)) + r'\.(\d{6})(\.gz|\.zst)?$')
+log_segment_lock = threading.Lock()
+log_segment_listing = {'key': None, 'segments': {}}
+log_segment_cache = OrderedDict()
+
+def log_segment_path(seq):
+    return f'{LOG_FILE}.{seq:06d}'
+
+# {seq: path} of every rotated segment, re-listed only when the directory
+# changes. A segment that is still being compressed is listed under its
+# uncompressed name.
+def log_segments():
+    directory = os.path.dirname(os.path.abspath(LOG_FILE))
+    stat = os.stat(directory)
+    key = (stat.st_mtime_ns, stat.st_ino)
+    with log_segment_lock:
+        if log_segment_listing['key'] == key:
+            return log_segment_listing['segments']
+    segments = {}
+    for name in os.listdir(directory):
+        match = LOG_SEGMENT_PATTERN.match(name)
+        if match:
+            seq = int(match.group(1))
+            if seq not in segments or not match.group(2):
+                segments[seq] = os.path.join(os.path.dirname(LOG_FILE), name)
+    segments = dict(sorted(segments.items()))
+    with log_segment_lock:
+        log_segment_listing.update(key=key, segments=segments)
+    return segments
+
+def forget_log_segments():
+    with log_segment_lock:
+        log_segment_listing['key'] = None
+
+# Segment number of the active app.log
+def active_log_seq():
+    segments = log_segments()
+    return max(segments) + 1 if segments else 1
+
+def log_position(seq, offset):
+    return (seq << LOG_OFFSET_BITS) | offset
+
+def split_log_position(position):
+    return position >> LOG_OFFSET_BITS, position & ((1 << LOG_OFFSET_BITS) - 1)
+
+def log_segment_frames_path(path):
+    return path + '.frames'
+
+def decompress_log_frame(path, data):
+    if path.endswith('.gz'):
+        return gzip.decompress(data)
+    if path.endswith('.zst'):
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data
+
+# Secure #3: Read-only, seekable view of a compressed segment. The frame
+# table (app.log.NNNNNN.gz.frames) holds the uncompressed and compressed
+# offset of every frame plus the totals, and only the frames a read covers
+# are decompressed; the last few stay in memory for paging. A segment
+# compressed as one stream, without a table, is a single frame.
+class LogSegmentFile(io.RawIOBase):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.offsets = None
+        try:
+            with open(log_segment_frames_path(path), 'rb') as f:
+                table = array('Q', f.read())
+            self.starts, self.offsets = table[0::2], table[1::2]
+        except FileNotFoundError:
+            self.starts = array('Q', [0, len(self._frame(0))])
+        self.size = self.starts[-1]
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.pos, os.SEEK_END: self.size}[whence]
+        self.pos = max(base + offset, 0)
+        return self.pos
+
+    def _frame(self, i):
+        key = (self.path, i)
+        with log_segment_lock:
+            if key in log_segment_cache:
+                log_segment_cache.move_to_end(key)
+                return log_segment_cache[key]
+        if self.offsets is not None:
+            self.file.seek(self.offsets[i])
+            data = self.file.read(self.offsets[i + 1] - self.offsets[i])
+        else:
+            self.file.seek(0)
+            data = self.file.read()
+        data = decompress_log_frame(self.path, data)
+        with log_segment_lock:
+            log_segment_cache[key] = data
+            while len(log_segment_cache) > LOG_SEGMENT_CACHE:
+                log_segment_cache.popitem(last=False)
+        return data
+
+    def readinto(self, buffer):
+        if self.pos >= self.size:
+            return 0
+        i = bisect_right(self.starts, self.pos) - 1
+        data = self._frame(i)
+        start = self.pos - self.starts[i]
+        n = min(len(buffer), len(data) - start)
+        buffer[:n] = data[start:start + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+# Open a rotated segment for reading as a seekable binary file, or return
+# None if it no longer exists
+def open_log_segment(seq):
+    path = log_segments().get(seq)
+    if path is None:
+        return None
+    try:
+        if path.endswith(('.gz', '.zst')):
+            return io.BufferedReader(LogSegmentFile(path), LOG_READ_BLOCK)
+        return open(path, 'rb')
+    except FileNotFoundError:
+        # compressed or pruned since it was listed
+        forget_log_segments()
+        return open_log_segment(seq) if seq in log_segments() else None
+
+# Compress a segment one frame at a time. Every frame is a complete gzip
+# member or zstd frame, so the result is still an ordinary .gz/.zst file.
+def compress_log_segment(path):
+    use_zstd = LOG_COMPRESSION == 'zstd' and zstandard is not None
+    target = path + ('.zst' if use_zstd else '.gz')
+    compress = zstandard.ZstdCompressor().compress if use_zstd else gzip.compress
+    table = array('Q')
+    try:
+        with open(path, 'rb') as src, open(target + '.tmp', 'wb') as dst:
+            start = 0
+            while True:
+                # whole lines only, so a frame never splits a line
+                chunk = src.read(LOG_SEGMENT_FRAME)
+                if chunk and not chunk.endswith(b'\n'):
+                    chunk += src.readline()
+                table.extend((start, dst.tell()))
+                if not chunk:
+                    break
+                dst.write(compress(chunk))
+                start += len(chunk)
+        frames = log_segment_frames_path(target)
+        with open(frames + '.tmp', 'wb') as f:
+            table.tofile(f)
+        os.replace(frames + '.tmp', frames)
+        os.replace(target + '.tmp', target)
+        os.remove(path)
+    except Exception as e:
+        logging.getLogger(__name__).error(f'Error compressing log segment {path}: {str(e)}')
+    forget_log_segments()
+    prune_log_segments()
+
+def prune_log_segments():
+    if LOG_RETENTION <= 0:
+        return
+    segments = log_segments()
+    for seq in list(segments)[:-LOG_RETENTION]:
+        for path in (segments[seq], log_segment_frames_path(segments[seq])):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    forget_log_segments()
+
+# Segments left uncompressed by a process that exited mid-compression
+def compress_pending_log_segments():
+    for path in log_segments().values():
+        if not path.endswith(('.gz', '.zst')):
+            threading.Thread(target=compress_log_segment, args=(path,),
+                             name='log-compressor', daemon=True).start()
+
+# Secure #3: Every worker process appends to the same log file and checks on
+# its own whether it is due for rotation. Rotation holds an exclusive flock
+# on <file>.lock, and a worker whose open file has already been rotated by
+# another one only reopens the path.
+@contextmanager
+def log_rotation_lock(path):
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+# True if `path` is no longer the file `stream` has open
+def log_file_replaced(stream, path):
+    try:
+        return not os.path.samestat(os.fstat(stream.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return True
+
+LOG_STAMP_PATTERN = re.compile(rb'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3} - ')
+
+# Time of the first record in a log file (when it was started, unlike the
+# mtime, which moves with every write), or None if it is empty or missing
+def log_file_started(path):
+    try:
+        with open(path, 'rb') as f:
+            match = LOG_STAMP_PATTERN.match(f.readline())
+    except OSError:
+        return None
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1).decode('ascii'), '%Y-%m-%d %H:%M:%S').timestamp()
+
+# Secure #3: app.log handler that rotates by size and by age. The active file
+# is renamed to the next segment number and compressed in the background, and
+# the line index of the old file is dropped.
+class SegmentedLogHandler(logging.handlers.BaseRotatingHandler):
+    def __init__(self, filename=LOG_FILE, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_SECONDS):
+        super().__init__(filename, 'a')
+        self.max_bytes = max_bytes
+        self.interval = interval
+        # set from the file's first record when the next record arrives
+        self.rollover_at = None
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if log_file_replaced(self.stream, self.baseFilename):
+            # rotated by another worker
+            return True
+        if self.interval > 0:
+            if self.rollover_at is None:
+                started = log_file_started(self.baseFilename)
+                self.rollover_at = (started if started is not None else record.created) + self.interval
+            if record.created >= self.rollover_at:
+                return True
+        return self.max_bytes > 0 and self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        with log_rotation_lock(self.baseFilename):
+            rotate = self.stream is not None and not log_file_replaced(self.stream, self.baseFilename)
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            if rotate and os.path.getsize(self.baseFilename) > 0:
+                forget_log_segments()
+                segment = log_segment_path(active_log_seq())
+                os.rename(self.baseFilename, segment)
+                forget_log_segments()
+                try:
+                    os.remove(LOG_INDEX_FILE)
+                except OSError:
+                    pass
+                compressor = threading.Timer(LOG_COMPRESS_DELAY, compress_log_segment, args=(segment,))
+                compressor.name = 'log-compressor'
+                compressor.daemon = True
+                compressor.start()
+            self.stream = self._open()
+        self.rollover_at = None
+
+log_handler = None
+
+# Attach the app.log handler to the root logger, once per process
+def configure_logging(mode=LOG_MODE):
+    global log_handler
+    if log_handler is not None:
+        return log_handler
+    file_handler = SegmentedLogHandler()
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler = file_handler
+    if mode == 'async':
+        handler = BatchingLogHandler(file_handler)
+        atexit.register(handler.close)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(handler)
+    compress_pending_log_segments()
+    log_handler = handler
+    return handler
+
+# Wait until every record logged so far is in app.log
+def flush_log():
+    if log_handler is not None:
+        log_handler.flush()
+
+def log_pipeline_stats():
+    if isinstance(log_handler, BatchingLogHandler):
+        return log_handler.stats()
+    return {'mode': 'sync'}
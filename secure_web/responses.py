@@ -0,0 +1,32 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression and conditional GET. Text responses are compressed
+# with brotli (when installed) or gzip according to Accept-Encoding. Pages
+# compute a strong ETag from the data they show before rendering anything,
+# so an unchanged page is answered with 304 without touching the template.
+# ETags include the negotiated encoding because each encoding is a different
+# representation; gzip output is made deterministic with mtime=0.
+COMPRESS_MIN_SIZE = 500
+COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript')
+COMPRESS_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    return gzip.compress(body, mtime=0)
+
+def negotiate_encoding():
+    for encoding in COMPRESS_ENCODINGS:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+def representation_etag(base):
+    return f'{base}-{negotiate_encoding() or "identity"}'
@@ -0,0 +1,179 @@
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import threading
+import json
+import time
+import os
+
+from flask import current_app
+
+from .audit import AUDIT_LOG_FILE
+from .auth import SlidingWindowSketch
+from .extensions import subsystem, track_fork
+from .log_viewer import LogFollower
+
+# Secure #3: Security-event detector. It follows the structured audit trail
+# (audit.jsonl, so every worker sees every worker's events, with the user
+# and IP as recorded by the server rather than parsed out of free text) and
+# reads each new event once: an event that matches a rule bumps a
+# sliding-window counter for its user or IP, and crossing the rule's limit
+# raises an alert. The counters live in one count-min sketch and the alerts
+# in a capped table, so memory stays the same however many users and IPs
+# show up.
+SECURITY_DETECTOR = os.environ.get('SECURITY_DETECTOR', '1') == '1'
+SECURITY_WINDOW = int(os.environ.get('SECURITY_WINDOW', 300))
+SECURITY_LIMIT_LOGIN_IP = int(os.environ.get('SECURITY_LIMIT_LOGIN_IP', 20))
+SECURITY_LIMIT_LOGIN_USER = int(os.environ.get('SECURITY_LIMIT_LOGIN_USER', 10))
+SECURITY_LIMIT_TOKEN = int(os.environ.get('SECURITY_LIMIT_TOKEN', 10))
+SECURITY_LIMIT_NON_ADMIN = int(os.environ.get('SECURITY_LIMIT_NON_ADMIN', 5))
+SECURITY_LIMIT_UNAUTHORIZED = int(os.environ.get('SECURITY_LIMIT_UNAUTHORIZED', 30))
+SECURITY_LIMIT_INGEST = int(os.environ.get('SECURITY_LIMIT_INGEST', 10))
+SECURITY_ALERT_MAX = int(os.environ.get('SECURITY_ALERT_MAX', 1000))
+SECURITY_SKETCH_WIDTH = int(os.environ.get('SECURITY_SKETCH_WIDTH', 16384))
+
+# One rule per kind of suspicious audit event: the event and outcomes it
+# matches, the field it counts per (user or ip) and the limit per window
+SecurityRule = namedtuple('SecurityRule', 'name event outcomes field limit description')
+
+SECURITY_RULES = (
+    SecurityRule('brute_force_ip', 'login', ('failure', 'throttled'), 'ip', SECURITY_LIMIT_LOGIN_IP,
+                 'Login gagal berulang dari satu IP'),
+    SecurityRule('brute_force_user', 'login', ('failure', 'throttled'), 'user', SECURITY_LIMIT_LOGIN_USER,
+                 'Login gagal berulang untuk satu username'),
+    SecurityRule('token_abuse', 'data_detail', ('invalid_token',), 'user', SECURITY_LIMIT_TOKEN,
+                 'Token URL tidak valid berulang kali'),
+    SecurityRule('non_admin_access', 'non_admin_access', ('denied',), 'user', SECURITY_LIMIT_NON_ADMIN,
+                 'User biasa berulang kali membuka halaman admin'),
+    SecurityRule('unauthorized_access', 'unauthorized_access', ('denied',), 'ip', SECURITY_LIMIT_UNAUTHORIZED,
+                 'Akses halaman tanpa login berulang dari satu IP'),
+    SecurityRule('ingest_rejected', 'cctv_ingest', ('denied',), 'ip', SECURITY_LIMIT_INGEST,
+                 'Token ingest CCTV salah berulang dari satu IP')
+)
+
+# One audit.jsonl line as a dict with `ts` as a unix time and `time` for
+# display, or None if it isn't an audit event
+def parse_audit_event(position, raw):
+    try:
+        event = json.loads(raw)
+        stamp = event['ts']
+        event['ts'] = datetime.fromisoformat(stamp).timestamp()
+    except (ValueError, TypeError, KeyError):
+        return None
+    event['time'] = stamp[:19].replace('T', ' ')
+    return event
+
+class SecurityDetector:
+    def __init__(self, rules=SECURITY_RULES, window=SECURITY_WINDOW, max_alerts=SECURITY_ALERT_MAX,
+                 width=SECURITY_SKETCH_WIDTH):
+        self.rules = rules
+        self.by_event = {}
+        for rule in rules:
+            self.by_event.setdefault(rule.event, []).append(rule)
+        self.window = window
+        self.max_alerts = max_alerts
+        self.counters = SlidingWindowSketch(window, width)
+        self.lock = threading.Lock()
+        # (rule, key) -> alert, oldest first; an alert raised again within
+        # the window is updated in place
+        self.alerts = OrderedDict()
+        self.clock = 0
+        self.lines = 0
+        self.events = 0
+        self.raised = 0
+        self.follower = None
+        track_fork(self)
+
+    # The follower thread stays with the parent; a child follows the audit
+    # trail again on its first request
+    def after_fork(self):
+        self.lock = threading.Lock()
+        self.counters.lock = threading.Lock()
+        self.follower = None
+
+    def start(self, follower):
+        with self.lock:
+            if self.follower is not None:
+                return
+            self.follower = follower
+        follower.subscribe(self)
+
+    # Called by the follower with each batch of parsed audit events
+    def put(self, entries):
+        for entry in entries:
+            self.observe(entry)
+
+    def observe(self, entry):
+        self.lines += 1
+        if entry is None:
+            return
+        rules = self.by_event.get(entry.get('event'))
+        if rules is None:
+            return
+        # batched writes can land slightly out of order; the clock never
+        # goes backwards
+        now = self.clock = max(entry['ts'], self.clock)
+        for rule in rules:
+            if entry.get('outcome') not in rule.outcomes:
+                continue
+            key = entry.get(rule.field)
+            if key is None:
+                continue
+            key = str(key)
+            self.events += 1
+            counter = f'{rule.name}:{key}'
+            self.counters.add(counter, now)
+            count = self.counters.estimate(counter, now)
+            if count >= rule.limit:
+                self.alert(rule, key, int(count), entry, now)
+
+    def alert(self, rule, key, count, entry, now):
+        with self.lock:
+            alert = self.alerts.get((rule.name, key))
+            if alert is not None and now - alert['last_ts'] <= self.window:
+                alert.update(count=max(count, alert['count']), last_ts=now, last=entry['time'])
+                self.alerts.move_to_end((rule.name, key))
+                return
+            self.alerts[rule.name, key] = {
+                'rule': rule.name, 'description': rule.description, 'field': rule.field, 'key': key,
+                'count': count, 'limit': rule.limit, 'window': self.window,
+                'first': entry['time'], 'last': entry['time'], 'first_ts': now, 'last_ts': now
+            }
+            self.alerts.move_to_end((rule.name, key))
+            self.raised += 1
+            if len(self.alerts) > self.max_alerts:
+                self.alerts.popitem(last=False)
+
+    # One pass over a whole audit file, e.g. to replay history
+    def scan(self, path):
+        with open(path, 'rb') as f:
+            for raw in f:
+                self.observe(parse_audit_event(None, raw))
+
+    # Alerts most recently raised or updated first. An alert is active while
+    # its last matching event is less than a window old.
+    def recent_alerts(self, limit=None):
+        now = time.time()
+        with self.lock:
+            alerts = [dict(alert) for alert in reversed(self.alerts.values())]
+        for alert in alerts[:limit]:
+            alert['active'] = now - alert['last_ts'] <= self.window
+        return alerts[:limit]
+
+    def stats(self):
+        return {'lines': self.lines, 'events': self.events, 'alerts_raised': self.raised,
+                'alerts_kept': len(self.alerts), 'window': self.window,
+                'following': self.follower is not None}
+
+def get_security_detector():
+    return subsystem('security_detector', lambda app: SecurityDetector())
+
+def get_audit_follower():
+    return subsystem('audit_follower', lambda app: LogFollower(AUDIT_LOG_FILE, parse=parse_audit_event))
+
+# before_request hook: make sure this process follows the audit trail
+def watch_security_log():
+    if not current_app.config['SECURITY_DETECTOR']:
+        return
+    detector = get_security_detector()
+    if detector.follower is None:
+        detector.start(get_audit_follower())
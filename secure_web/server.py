@@ -0,0 +1,125 @@
+import logging
+import signal
+import gc
+import os
+
+from .assets import get_assets, template_version
+from .audit import audit_logger
+from .auth import get_users
+from .cctv import get_cctv_registry
+from .data import get_data_store
+from .log_viewer import get_log_catalog
+from .logs import BatchingLogHandler, forget_log_segments
+from .sessions import ServerSessionInterface
+from .templates import preload_templates
+
+try:
+    import gunicorn.app.base
+except ImportError:
+    gunicorn = None
+
+logger = logging.getLogger(__name__)
+
+# Production server. SERVER_WORKERS processes with SERVER_THREADS threads each
+# under gunicorn; without gunicorn, one Werkzeug process with SERVER_THREADS
+# threads. Everything is loaded in the master before the workers are forked, so
+# templates, assets and indexes are shared copy-on-write. SIGHUP re-opens
+# the log files; under gunicorn it also replaces the workers gracefully,
+# letting in-flight requests finish.
+SERVER_HOST = os.environ.get('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('SERVER_PORT', 5000))
+SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+
+def log_file_handlers():
+    for logger in (logging.getLogger(), audit_logger):
+        for handler in logger.handlers:
+            if isinstance(handler, BatchingLogHandler):
+                handler = handler.target
+            if isinstance(handler, logging.FileHandler):
+                yield handler
+
+# Close the log streams; each handler opens its file again on the next write
+def reopen_log_files():
+    for handler in log_file_handlers():
+        handler.acquire()
+        try:
+            if handler.stream is not None:
+                handler.stream.close()
+                handler.stream = None
+        finally:
+            handler.release()
+    forget_log_segments()
+    logger.info('Log files reopened')
+
+# Build every lazily created subsystem in the master, so the workers share
+# them instead of each building its own on its first requests, then freeze
+# it all out of the garbage collector so collections in the workers don't
+# touch (and copy) those pages
+def create_wsgi_app(app, workers=SERVER_WORKERS, threads=SERVER_THREADS):
+    preload_templates(app)
+    get_assets()
+    template_version()
+    get_users()
+    # heartbeats reach one worker, but every worker serves the status
+    if workers > 1 and app.config['CCTV_STATE_BACKEND'] == 'memory':
+        logger.warning('CCTV status in memory is per process, switching to sqlite for multiple workers')
+        app.config['CCTV_STATE_BACKEND'] = 'sqlite'
+    # live streams hold a thread each; keep the other half for page requests
+    if app.config['STREAM_THREAD_LIMIT'] is None:
+        app.config['STREAM_THREAD_LIMIT'] = threads // 2
+    with app.app_context():
+        get_data_store()
+        get_cctv_registry()
+        get_log_catalog().update()
+    if workers > 1 and isinstance(app.session_interface, ServerSessionInterface) and \
+            app.session_interface.backend == 'memory':
+        logger.warning('Memory sessions are per process, switching to sqlite for multiple workers')
+        app.session_interface = ServerSessionInterface('sqlite', app.config['SESSION_PATH'])
+    gc.collect()
+    gc.freeze()
+    return app
+
+def flush_log_handlers():
+    for logger in (logging.getLogger(), audit_logger):
+        for handler in logger.handlers:
+            handler.flush()
+
+if gunicorn is not None:
+    class GunicornServer(gunicorn.app.base.BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def serve(app, host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS, threads=SERVER_THREADS):
+    # Werkzeug can only fork a process per request, which would throw away
+    # everything kept in process memory (login limiter, token caches, CCTV
+    # registry, security detector) after every response
+    if gunicorn is None and workers > 1:
+        logger.warning(f'gunicorn is not installed, serving with one process instead of {workers} workers')
+        workers = 1
+    application = create_wsgi_app(app, workers, threads)
+    logger.info(f'Starting server on {host}:{port} - Workers: {workers} - Threads: {threads}')
+    if gunicorn is not None:
+        GunicornServer(application, {
+            'bind': f'{host}:{port}',
+            'workers': workers,
+            'threads': threads,
+            'worker_class': 'gthread',
+            'preload_app': True,
+            'graceful_timeout': SERVER_GRACEFUL_TIMEOUT,
+            'on_reload': lambda arbiter: reopen_log_files(),
+        }).run()
+        return
+    from werkzeug.serving import run_simple
+    signal.signal(signal.SIGHUP, lambda signum, frame: reopen_log_files())
+    run_simple(host, port, application, threaded=threads > 1)
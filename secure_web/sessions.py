@@ -0,0 +1,229 @@
+from collections import OrderedDict
+import threading
+import sqlite3
+import secrets
+import time
+import os
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature
+from werkzeug.datastructures import CallbackDict
+
+from .extensions import track_fork
+
+# Secure #2: Server-side sessions. The cookie only carries a random session id;
+# the session itself lives in a store picked by SESSION_BACKEND:
+#   memory  in-process LRU of at most SESSION_CACHE_SIZE sessions (default)
+#   sqlite  SQLite file at SESSION_PATH, shared by every worker process
+#   cookie  Flask's signed cookie, sessions can't be revoked
+# Sessions expire SESSION_LIFETIME seconds after they were last saved and are
+# renewed once half of that has passed. Expired sessions are dropped when
+# they are next looked up, and the sqlite store also purges them now and then.
+# An anonymous session that only carries flash messages (a failed login, a
+# redirect to the login page) is kept in a signed <name>_flash cookie
+# instead, so anonymous traffic can't fill or evict the store.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_PATH = os.environ.get('SESSION_PATH', 'sessions.db')
+SESSION_LIFETIME = int(os.environ.get('SESSION_LIFETIME', 8 * 60 * 60))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 100000))
+SESSION_PURGE_EVERY = 1000
+SESSION_COOKIE_KEYS = frozenset(('_flashes',))
+
+session_serializer = TaggedJSONSerializer()
+
+class MemorySessionStore:
+    def __init__(self, capacity=SESSION_CACHE_SIZE):
+        self.capacity = capacity
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    # (data, expires) or None
+    def get(self, sid):
+        with self.lock:
+            entry = self.sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.sessions[sid]
+                return None
+            self.sessions.move_to_end(sid)
+        return session_serializer.loads(entry[0]), entry[1]
+
+    def save(self, sid, data, expires):
+        entry = (session_serializer.dumps(data), expires)
+        with self.lock:
+            self.sessions[sid] = entry
+            self.sessions.move_to_end(sid)
+            while len(self.sessions) > self.capacity:
+                self.sessions.popitem(last=False)
+
+    def delete(self, sid):
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+    def __len__(self):
+        return len(self.sessions)
+
+class SQLiteSessionStore:
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT, expires REAL);
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.saves = 0
+        track_fork(self)
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+
+    def _db(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.executescript(self.SCHEMA)
+            self.local.db = db
+        return db
+
+    def after_fork(self):
+        self.local = threading.local()
+
+    def get(self, sid):
+        row = self._db().execute('SELECT data, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= time.time():
+            self.delete(sid)
+            return None
+        return session_serializer.loads(row[0]), row[1]
+
+    def save(self, sid, data, expires):
+        db = self._db()
+        db.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)', (sid, session_serializer.dumps(data), expires))
+        self.saves += 1
+        if self.saves % SESSION_PURGE_EVERY == 0:
+            db.execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+
+    def delete(self, sid):
+        self._db().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+# Signs the flash cookie with its own salt, so no cookie session signed by
+# this app (SESSION_BACKEND=cookie) can pass for one
+class FlashCookieSerializer(SecureCookieSessionInterface):
+    salt = 'flash-cookie-session'
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.new = sid is None
+        self.modified = False
+        # loaded from the flash cookie rather than the store
+        self.in_cookie = False
+        # set on login so a session id from before authentication is never reused
+        self.rotate = False
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, backend=SESSION_BACKEND, path=SESSION_PATH):
+        self.backend = backend
+        self.path = path
+        self.lock = threading.Lock()
+        self._store = None
+        self.cookie = FlashCookieSerializer()
+
+    # Opened when the first session is looked up or saved
+    @property
+    def store(self):
+        if self._store is None:
+            with self.lock:
+                if self._store is None:
+                    self._store = open_session_store(self.backend, self.path)
+        return self._store
+
+    def flash_cookie_name(self, app):
+        return self.get_cookie_name(app) + '_flash'
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.get(sid)
+            if entry is not None:
+                return ServerSession(entry[0], sid, entry[1])
+        session = ServerSession()
+        value = request.cookies.get(self.flash_cookie_name(app))
+        serializer = self.cookie.get_signing_serializer(app)
+        if value and serializer is not None:
+            try:
+                data = serializer.loads(value, max_age=SESSION_LIFETIME)
+            except BadSignature:
+                data = None
+            # a flash cookie carries flashes and nothing else
+            if data and isinstance(data, dict) and data.keys() <= SESSION_COOKIE_KEYS:
+                session = ServerSession(data)
+                session.in_cookie = True
+        return session
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        flash_name = self.flash_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        serializer = self.cookie.get_signing_serializer(app)
+        if session and (session.sid is None or session.rotate) and \
+                session.keys() <= SESSION_COOKIE_KEYS and serializer is not None:
+            response.vary.add('Cookie')
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            if session.modified or not session.in_cookie:
+                response.set_cookie(flash_name, serializer.dumps(dict(session)),
+                                    httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                    secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+            return
+        if session.in_cookie:
+            # emptied, or moved into the store
+            response.delete_cookie(flash_name, domain=domain, path=path)
+            response.vary.add('Cookie')
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add('Cookie')
+            return
+        response.vary.add('Cookie')
+        old_sid = session.sid
+        if session.rotate and old_sid is not None:
+            self.store.delete(old_sid)
+            session.sid = None
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        now = time.time()
+        renew = session.expires is None or session.expires - now < SESSION_LIFETIME / 2
+        if session.modified or renew or session.sid != old_sid:
+            self.store.save(session.sid, dict(session), now + SESSION_LIFETIME)
+        if session.sid != old_sid or (renew and session.permanent):
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+    # Drop the session from the store right away; anything stored in it later
+    # in the request goes to a fresh session id
+    def revoke(self, session):
+        if session.sid is not None:
+            self.store.delete(session.sid)
+        session.clear()
+        session.rotate = True
+
+def open_session_store(backend=SESSION_BACKEND, path=SESSION_PATH):
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path)
+    raise ValueError(f'Unknown SESSION_BACKEND: {backend}')
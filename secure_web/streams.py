@@ -0,0 +1,213 @@
+from collections import deque
+import threading
+import asyncio
+import queue
+import time
+import os
+
+# Items a live-stream subscriber may have queued before the oldest are dropped
+STREAM_BACKLOG = 1000
+# A stream served by a WSGI worker thread holds that thread, so it ends after
+# STREAM_MAX_SECONDS (the browser reconnects on its own), and only
+# STREAM_THREAD_LIMIT of them may be open per process at once; the rest get
+# a 503. create_wsgi_app() sets the limit to half of the server's threads
+# unless it is configured; the development server has none. Streams served
+# by the ASGI mode hold no thread and have neither limit.
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', 300))
+STREAM_THREAD_LIMIT = int(os.environ['STREAM_THREAD_LIMIT']) if os.environ.get('STREAM_THREAD_LIMIT') else None
+STREAM_RETRY_SECONDS = 30
+
+# Fan-out of one producer to many subscribers. Each subscriber has its own
+# bounded queue; a subscriber that falls behind loses its oldest items
+# instead of slowing the producer down.
+class Subscription:
+    def __init__(self, maxsize=STREAM_BACKLOG):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    # Next item, or None after `timeout` seconds without one
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class BroadcastHub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    # `subscription` is anything with put(item); a new Subscription by default
+    def subscribe(self, subscription=None):
+        if subscription is None:
+            subscription = Subscription()
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, item):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(item)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+# Count of worker threads held by open streams in this process
+class StreamSlots:
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.used -= 1
+
+# Subscription for a coroutine on an event loop; put() must be called on
+# that loop (see LoopRelay)
+class AsyncSubscription:
+    def __init__(self, maxsize=STREAM_BACKLOG):
+        self.queue = deque()
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.waiter = None
+
+    def put(self, item):
+        if len(self.queue) >= self.maxsize:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(item)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    # Next item, or None after `timeout` seconds without one
+    async def get(self, timeout=None):
+        if not self.queue:
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self.waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self.waiter = None
+        return self.queue.popleft()
+
+# Hands the items of a thread-side source (a BroadcastHub, or a producer
+# with the same subscribe/unsubscribe) to async subscribers on one event
+# loop. The relay holds a single subscription on the source while anyone is
+# subscribed, so a publish costs one loop wake-up however many connections
+# are waiting.
+class LoopRelay:
+    def __init__(self, source, loop):
+        self.source = source
+        self.loop = loop
+        self.subscribers = set()
+
+    def subscribe(self, subscription):
+        self.subscribers.add(subscription)
+        if len(self.subscribers) == 1:
+            self.source.subscribe(self)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers:
+            self.source.unsubscribe(self)
+
+    # Called on the publishing thread
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.deliver, item)
+
+    def deliver(self, item):
+        for subscription in list(self.subscribers):
+            subscription.put(item)
+
+# Body of a server-sent-events response: a subscription to `source`
+# rendered as SSE text. A WSGI server iterates it, blocking its worker
+# thread between messages; the ASGI mode reads events() on the event loop
+# instead, through a LoopRelay. Subclasses render the published items.
+class EventStream:
+    retry = 3000
+    keepalive = 15
+    lifetime = STREAM_MAX_SECONDS
+
+    def __init__(self, source):
+        self.source = source
+        self.finished = False
+        self.iterator = None
+        # StreamSlots the stream holds a slot of while a thread serves it
+        self.slots = None
+
+    # First text sent on the stream
+    def opening(self, subscription):
+        return f'retry: {self.retry}\n\n'
+
+    # SSE text for one published item; set self.finished to end the stream after it
+    def render(self, item, subscription):
+        return item
+
+    def __iter__(self):
+        self.iterator = self.iterate()
+        return self.iterator
+
+    def iterate(self):
+        deadline = time.monotonic() + self.lifetime
+        subscription = self.source.subscribe()
+        try:
+            yield self.opening(subscription).encode()
+            while not self.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                item = subscription.get(timeout=min(self.keepalive, remaining))
+                if item is None and time.monotonic() >= deadline:
+                    break
+                yield (': keepalive\n\n' if item is None else self.render(item, subscription)).encode()
+        finally:
+            self.source.unsubscribe(subscription)
+            self.release()
+
+    def release(self):
+        slots, self.slots = self.slots, None
+        if slots is not None:
+            slots.release()
+
+    def close(self):
+        if self.iterator is not None:
+            self.iterator.close()
+        self.release()
+
+    async def events(self, relay):
+        subscription = relay.subscribe(AsyncSubscription())
+        try:
+            yield self.opening(subscription).encode()
+            while not self.finished:
+                item = await subscription.get(timeout=self.keepalive)
+                yield (': keepalive\n\n' if item is None else self.render(item, subscription)).encode()
+        finally:
+            relay.unsubscribe(subscription)
@@ -0,0 +1,1066 @@
+import hashlib
+import json
+import os
+
+from jinja2 import ChoiceLoader, DictLoader, ModuleLoader
+
+# Shared stylesheet for every page. It is served minified from /assets under
+# a content-hashed name (see build_assets), so browsers can cache it for good
+# and pick up a new copy whenever it changes.
+APP_CSS = '''
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    min-height: 100vh;
+}
+
+.navbar {
+    background: rgba(255, 255, 255, 0.95);
+    backdrop-filter: blur(10px);
+    padding: 15px 0;
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+}
+.navbar .container {
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 0 20px;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+.navbar-brand {
+    font-size: 24px;
+    font-weight: bold;
+    color: #667eea;
+    text-decoration: none;
+}
+.navbar-brand span {
+    color: #764ba2;
+}
+.navbar-menu {
+    display: flex;
+    gap: 10px;
+    align-items: center;
+}
+.nav-link {
+    padding: 8px 16px;
+    text-decoration: none;
+    color: #333;
+    border-radius: 6px;
+    transition: all 0.3s;
+    font-weight: 500;
+}
+.nav-link:hover {
+    background: #667eea;
+    color: white;
+}
+.nav-link.active {
+    background: #667eea;
+    color: white;
+}
+.user-info-nav {
+    padding: 8px 16px;
+    background: #f0f0f0;
+    border-radius: 6px;
+    margin-left: 10px;
+}
+
+.main-container {
+    max-width: 1200px;
+    margin: 30px auto;
+    padding: 0 20px;
+}
+
+.content-box {
+    background: white;
+    padding: 30px;
+    border-radius: 12px;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.1);
+}
+
+.alert {
+    padding: 12px 20px;
+    margin: 15px 0;
+    border-radius: 8px;
+    font-weight: 500;
+}
+.alert-success { background: #d4edda; color: #155724; border-left: 4px solid #28a745; }
+.alert-danger { background: #f8d7da; color: #721c24; border-left: 4px solid #dc3545; }
+.alert-info { background: #d1ecf1; color: #0c5460; border-left: 4px solid #17a2b8; }
+
+.dashboard-header {
+    text-align: center;
+    margin-bottom: 30px;
+    padding-bottom: 20px;
+    border-bottom: 3px solid #667eea;
+}
+.dashboard-header h1 {
+    color: #333;
+    font-size: 32px;
+    margin-bottom: 10px;
+}
+.dashboard-header p {
+    color: #666;
+    font-size: 16px;
+}
+
+.stats-container {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 20px;
+    margin-bottom: 30px;
+}
+.stat-card {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    padding: 20px;
+    border-radius: 10px;
+    text-align: center;
+}
+.stat-card h3 {
+    font-size: 36px;
+    margin-bottom: 5px;
+}
+.stat-card p {
+    font-size: 14px;
+    opacity: 0.9;
+}
+
+.region-list {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 8px;
+    margin-bottom: 15px;
+}
+.region-chip {
+    padding: 6px 12px;
+    background: #f0f0f0;
+    border-radius: 14px;
+    font-size: 13px;
+    color: #555;
+    text-decoration: none;
+}
+.cctv-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
+    gap: 20px;
+    margin-top: 20px;
+}
+.cctv-card {
+    border: 2px solid #e0e0e0;
+    border-radius: 10px;
+    overflow: hidden;
+    transition: all 0.3s;
+}
+.cctv-card:hover {
+    transform: translateY(-5px);
+    box-shadow: 0 8px 20px rgba(0,0,0,0.15);
+}
+.cctv-preview {
+    width: 100%;
+    height: 180px;
+    background: linear-gradient(45deg, #2c3e50, #34495e);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: white;
+    font-size: 48px;
+}
+.cctv-info {
+    padding: 15px;
+}
+.cctv-info h3 {
+    color: #333;
+    margin-bottom: 8px;
+}
+.cctv-info p {
+    color: #666;
+    font-size: 14px;
+    margin-bottom: 5px;
+}
+.status-badge {
+    display: inline-block;
+    padding: 4px 12px;
+    border-radius: 20px;
+    font-size: 12px;
+    font-weight: bold;
+    margin-top: 8px;
+}
+.status-online {
+    background: #d4edda;
+    color: #155724;
+}
+.status-offline {
+    background: #f8d7da;
+    color: #721c24;
+}
+
+.security-info {
+    background: #fff3cd;
+    padding: 20px;
+    border-radius: 8px;
+    border-left: 4px solid #ffc107;
+    margin-top: 30px;
+}
+.security-info h3 {
+    color: #856404;
+    margin-bottom: 10px;
+}
+.security-info ul {
+    margin-left: 20px;
+}
+.security-info li {
+    margin: 5px 0;
+    color: #856404;
+}
+
+.login-box {
+    max-width: 400px;
+    margin: 50px auto;
+    background: white;
+    padding: 40px;
+    border-radius: 12px;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.1);
+}
+.login-header {
+    text-align: center;
+    margin-bottom: 30px;
+}
+.login-header h2 {
+    color: #333;
+    font-size: 28px;
+}
+.form-group {
+    margin-bottom: 20px;
+}
+.form-group label {
+    display: block;
+    margin-bottom: 8px;
+    font-weight: 500;
+    color: #333;
+}
+.form-group input {
+    width: 100%;
+    padding: 12px;
+    border: 2px solid #e0e0e0;
+    border-radius: 6px;
+    font-size: 14px;
+    transition: border 0.3s;
+}
+.form-group input:focus {
+    outline: none;
+    border-color: #667eea;
+}
+.btn-login {
+    width: 100%;
+    padding: 14px;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    border: none;
+    border-radius: 6px;
+    font-size: 16px;
+    font-weight: 600;
+    cursor: pointer;
+    transition: all 0.3s;
+}
+.btn-login:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 8px 20px rgba(102, 126, 234, 0.4);
+}
+.test-accounts {
+    background: #f8f9fa;
+    padding: 15px;
+    border-radius: 6px;
+    margin-top: 20px;
+    font-size: 13px;
+}
+.test-accounts strong {
+    display: block;
+    margin-bottom: 8px;
+    color: #333;
+}
+
+.page-header {
+    margin-bottom: 25px;
+    padding-bottom: 15px;
+    border-bottom: 2px solid #667eea;
+}
+.page-header h2 {
+    color: #333;
+    font-size: 28px;
+}
+.page-header-plain {
+    padding-bottom: 0;
+    border-bottom: none;
+}
+.data-item {
+    background: #f8f9fa;
+    padding: 20px;
+    margin: 15px 0;
+    border-radius: 8px;
+    border-left: 4px solid #667eea;
+    transition: all 0.3s;
+}
+.data-item:hover {
+    transform: translateX(5px);
+    box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+}
+.data-item h3 {
+    margin: 0 0 10px 0;
+    color: #667eea;
+}
+.data-item p {
+    color: #666;
+    margin-bottom: 15px;
+}
+.data-item.security-alert-active {
+    border-left-color: #dc3545;
+}
+.btn {
+    padding: 10px 20px;
+    margin: 5px;
+    text-decoration: none;
+    border-radius: 6px;
+    display: inline-block;
+    font-weight: 500;
+    transition: all 0.3s;
+    border: none;
+    cursor: pointer;
+}
+.btn-success {
+    background: #28a745;
+    color: white;
+}
+.btn-success:hover {
+    background: #218838;
+}
+.info-box {
+    background: #d1ecf1;
+    padding: 15px;
+    border-radius: 6px;
+    margin-bottom: 20px;
+    border-left: 4px solid #17a2b8;
+}
+.success-box {
+    background: #d4edda;
+    color: #155724;
+    padding: 15px;
+    border-radius: 6px;
+    border-left: 4px solid #28a745;
+    margin-bottom: 20px;
+}
+.token-box {
+    background: #fff3cd;
+    padding: 15px;
+    border-radius: 6px;
+    margin-bottom: 20px;
+    word-break: break-all;
+}
+.data-detail {
+    background: #e7f3ff;
+    padding: 25px;
+    border-radius: 8px;
+    border-left: 4px solid #667eea;
+}
+.data-detail h3 {
+    color: #667eea;
+    margin-bottom: 15px;
+}
+.data-detail p {
+    margin: 10px 0;
+    color: #333;
+}
+.btn-primary {
+    background: #667eea;
+    color: white;
+}
+.btn-primary:hover {
+    background: #5568d3;
+}
+.log-info {
+    background: #d1ecf1;
+    padding: 15px;
+    border-radius: 6px;
+    margin-bottom: 20px;
+    border-left: 4px solid #17a2b8;
+}
+.log-container {
+    background: #2c3e50;
+    color: #00ff00;
+    padding: 20px;
+    border-radius: 8px;
+    font-family: 'Courier New', monospace;
+    font-size: 13px;
+    max-height: 600px;
+    overflow-y: auto;
+    line-height: 1.6;
+}
+.log-container::-webkit-scrollbar {
+    width: 8px;
+}
+.log-container::-webkit-scrollbar-track {
+    background: #34495e;
+}
+.log-container::-webkit-scrollbar-thumb {
+    background: #667eea;
+    border-radius: 4px;
+}
+.log-line {
+    margin: 5px 0;
+    padding: 5px;
+    border-radius: 3px;
+}
+.log-line:hover {
+    background: rgba(255,255,255,0.1);
+}
+.log-level-INFO { color: #00ff00; }
+.log-level-WARNING { color: #ffaa00; }
+.log-level-ERROR { color: #ff5555; }
+.empty-log {
+    text-align: center;
+    color: #888;
+    padding: 40px;
+}
+.refresh-btn {
+    margin-bottom: 15px;
+}
+.log-filter {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 10px;
+    align-items: flex-end;
+    margin-bottom: 15px;
+}
+.log-filter label {
+    display: flex;
+    flex-direction: column;
+    font-size: 13px;
+    color: #555;
+    gap: 4px;
+}
+.log-filter input, .log-filter select {
+    padding: 8px;
+    border: 1px solid #ccc;
+    border-radius: 6px;
+}
+.log-pager {
+    margin-top: 15px;
+}
+.live-status {
+    margin-left: 10px;
+    color: #555;
+    font-size: 14px;
+}
+'''
+
+# Dashboard/Home Template
+DASHBOARD_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Dashboard - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link active">Dashboard</a>
+                
+                {% if session.get('username') == 'admin' %}
+                    <a href="{{ url_for('view_data') }}" class="nav-link">Data Rahasia</a>
+                    <a href="{{ url_for('view_logs') }}" class="nav-link">Log Data</a>
+                    <a href="{{ url_for('view_security') }}" class="nav-link">Keamanan</a>
+                {% endif %}
+                
+                {% if session.get('username') %}
+                    <span class="user-info-nav">👤 {{ session['username'] }}</span>
+                    <a href="{{ url_for('logout') }}" class="nav-link">Sign Out</a>
+                {% else %}
+                    <a href="{{ url_for('login') }}" class="nav-link">Sign In</a>
+                {% endif %}
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        {% with messages = get_flashed_messages(with_categories=true) %}
+            {% if messages %}
+                {% for category, message in messages %}
+                    <div class="alert alert-{{ category }}">{{ message }}</div>
+                {% endfor %}
+            {% endif %}
+        {% endwith %}
+        
+        <div class="content-box">
+            <div class="dashboard-header">
+                <h1>🎥 Pantauan CCTV Wilayah Sidoarjo</h1>
+                <p>Sistem Monitoring Keamanan Kota Sidoarjo</p>
+            </div>
+
+            <div class="stats-container">
+                <div class="stat-card">
+                    <h3 id="stat-total">{{ total_cctv }}</h3>
+                    <p>Total CCTV</p>
+                </div>
+                <div class="stat-card">
+                    <h3 id="stat-online">{{ online_cctv }}</h3>
+                    <p>Online</p>
+                </div>
+                <div class="stat-card">
+                    <h3 id="stat-offline">{{ offline_cctv }}</h3>
+                    <p>Offline</p>
+                </div>
+            </div>
+
+            <h2 style="margin-bottom: 15px;">📍 Lokasi CCTV</h2>
+
+            {% if regions %}
+            <div class="region-list">
+                {% for region in regions %}
+                <a href="{{ url_for('index', region=region.region) }}" class="region-chip" data-region="{{ region.region }}">{{ region.region }}: <strong>{{ region.online }}</strong>/<span>{{ region.total }}</span> online</a>
+                {% endfor %}
+            </div>
+            {% endif %}
+
+            {% if grid_filter %}
+            <p style="margin-bottom: 10px;">
+                Filter: {% for key, value in grid_filter.items() %}<strong>{{ value }}</strong> {% endfor %}
+                &middot; <a href="{{ url_for('index') }}">tampilkan semua</a>
+            </p>
+            {% endif %}
+
+            {{ cctv_grid }}
+
+            <div class="security-info">
+                <h3>🔒 Implementasi Keamanan Sistem</h3>
+                <ul>
+                    <li><strong>Secure #1:</strong> Token URL terenkripsi untuk akses data detail</li>
+                    <li><strong>Secure #2:</strong> Session management - Login required untuk data sensitif</li>
+                    <li><strong>Secure #3:</strong> Logging semua aktivitas sistem</li>
+                </ul>
+                {% if not session.get('username') %}
+                <p style="margin-top: 15px; font-style: italic;">
+                    💡 <strong>Catatan:</strong> Silakan login sebagai <strong>admin</strong> untuk mengakses data rahasia dan log sistem.
+                </p>
+                {% elif session.get('username') != 'admin' %}
+                <p style="margin-top: 15px; font-style: italic;">
+                    ⚠️ <strong>Info:</strong> Anda login sebagai <strong>{{ session['username'] }}</strong>. Hanya <strong>admin</strong> yang dapat mengakses data rahasia dan log sistem.
+                </p>
+                {% endif %}
+            </div>
+        </div>
+    </div>
+    <script>
+        // Live status: the server pushes only what changed since the page was rendered
+        (function () {
+            var version = {{ version }};
+            function connect() {
+                var source = new EventSource("{{ url_for('stream_cctv') }}?since=" + version);
+                source.addEventListener('reload', function () {
+                    source.close();
+                    window.location.reload();
+                });
+                // a busy server answers 503 and the browser stops retrying on its own
+                source.onerror = function () {
+                    if (source.readyState === EventSource.CLOSED) { setTimeout(connect, {{ stream_retry }}); }
+                };
+                source.onmessage = function (event) {
+                    version = event.lastEventId || version;
+                    var delta = JSON.parse(event.data);
+                    ['total', 'online', 'offline'].forEach(function (key) {
+                        document.getElementById('stat-' + key).textContent = delta.counts[key];
+                    });
+                    delta.regions.forEach(function (region) {
+                        document.querySelectorAll('.region-chip').forEach(function (chip) {
+                            if (chip.dataset.region === String(region.region)) {
+                                chip.querySelector('strong').textContent = region.online;
+                                chip.querySelector('span').textContent = region.total;
+                            }
+                        });
+                    });
+                    delta.changes.forEach(function (change) {
+                        var card = document.querySelector('.cctv-card[data-camera-id="' + change.id + '"]');
+                        if (!card) { return; }
+                        var online = change.status === 'Online';
+                        card.querySelector('.cctv-preview').textContent = online ? '📹' : '⚠️';
+                        var badge = card.querySelector('.status-badge');
+                        badge.className = 'status-badge status-' + change.status.toLowerCase();
+                        badge.textContent = change.status;
+                    });
+                };
+            }
+            connect();
+        })();
+    </script>
+</body>
+</html>
+'''
+
+# CCTV grid fragment, cached by CCTVRegistry.render_grid
+CCTV_GRID_TEMPLATE = '''
+            <div class="cctv-grid">
+                {% for cctv in cctv_list %}
+                <div class="cctv-card" data-camera-id="{{ cctv.id }}">
+                    <div class="cctv-preview">
+                        {% if cctv.status == 'Online' %}
+                            📹
+                        {% else %}
+                            ⚠️
+                        {% endif %}
+                    </div>
+                    <div class="cctv-info">
+                        <h3>{{ cctv.name }}</h3>
+                        <p>📍 {{ cctv.location }}</p>
+                        <span class="status-badge status-{{ cctv.status.lower() }}">
+                            {{ cctv.status }}
+                        </span>
+                    </div>
+                </div>
+                {% endfor %}
+            </div>
+'''
+
+# Login Template
+LOGIN_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Sign In - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link">Dashboard</a>
+                <a href="{{ url_for('login') }}" class="nav-link active">Sign In</a>
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        {% with messages = get_flashed_messages(with_categories=true) %}
+            {% if messages %}
+                {% for category, message in messages %}
+                    <div class="alert alert-{{ category }}">{{ message }}</div>
+                {% endfor %}
+            {% endif %}
+        {% endwith %}
+        
+        <div class="login-box">
+            <div class="login-header">
+                <h2>🔐 Sign In</h2>
+                <p>Masuk ke Sistem CCTV Sidoarjo</p>
+            </div>
+            
+            <form method="POST">
+                <div class="form-group">
+                    <label>Username:</label>
+                    <input type="text" name="username" required autofocus>
+                </div>
+                <div class="form-group">
+                    <label>Password:</label>
+                    <input type="password" name="password" required>
+                </div>
+                <button type="submit" class="btn-login">Sign In</button>
+            </form>
+            
+            <div class="test-accounts">
+                <strong>🧪 Test Accounts:</strong>
+                Username: <code>admin</code> | Password: <code>password123</code><br>
+                Username: <code>user1</code> | Password: <code>pass456</code>
+            </div>
+        </div>
+    </div>
+</body>
+</html>
+'''
+
+# Data Template
+DATA_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Data Rahasia - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link">Dashboard</a>
+                
+                {% if session.get('username') == 'admin' %}
+                    <a href="{{ url_for('view_data') }}" class="nav-link active">Data Rahasia</a>
+                    <a href="{{ url_for('view_logs') }}" class="nav-link">Log Data</a>
+                    <a href="{{ url_for('view_security') }}" class="nav-link">Keamanan</a>
+                {% endif %}
+                
+                {% if session.get('username') %}
+                    <span class="user-info-nav">👤 {{ session['username'] }}</span>
+                    <a href="{{ url_for('logout') }}" class="nav-link">Sign Out</a>
+                {% else %}
+                    <a href="{{ url_for('login') }}" class="nav-link">Sign In</a>
+                {% endif %}
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        <div class="content-box">
+            <div class="page-header">
+                <h2>📊 Data Rahasia</h2>
+                <p>Halo, <strong>{{ session['username'] }}</strong>! Berikut adalah data rahasia sistem:</p>
+            </div>
+
+            <div class="info-box">
+                💡 <strong>Secure #1 (Token URL):</strong> Klik "Lihat Detail" untuk melihat URL dengan token terenkripsi!
+            </div>
+
+            {% for data in data_list %}
+            <div class="data-item">
+                <h3>{{ data.title }}</h3>
+                <p>{{ data.content }}</p>
+                <a href="{{ url_for('view_detail', token=generate_token(data.id)) }}" class="btn btn-success">Lihat Detail</a>
+            </div>
+            {% endfor %}
+
+            {% if next_cursor is not none %}
+            <a href="{{ url_for('view_data', after=next_cursor, limit=request.args.get('limit')) }}" class="btn btn-primary">Data berikutnya →</a>
+            {% endif %}
+        </div>
+    </div>
+</body>
+</html>
+'''
+
+# Detail Template
+DETAIL_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Detail Data - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link">Dashboard</a>
+                
+                {% if session.get('username') == 'admin' %}
+                    <a href="{{ url_for('view_data') }}" class="nav-link active">Data Rahasia</a>
+                    <a href="{{ url_for('view_logs') }}" class="nav-link">Log Data</a>
+                    <a href="{{ url_for('view_security') }}" class="nav-link">Keamanan</a>
+                {% endif %}
+                
+                {% if session.get('username') %}
+                    <span class="user-info-nav">👤 {{ session['username'] }}</span>
+                    <a href="{{ url_for('logout') }}" class="nav-link">Sign Out</a>
+                {% else %}
+                    <a href="{{ url_for('login') }}" class="nav-link">Sign In</a>
+                {% endif %}
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        <div class="content-box">
+            <div class="page-header page-header-plain">
+                <h2>🔍 Detail Data</h2>
+            </div>
+
+            <div class="success-box">
+                ✅ <strong>Secure #1 berhasil!</strong> URL ini menggunakan token terenkripsi, bukan ID langsung.
+            </div>
+
+            <div class="token-box">
+                <strong>Token di URL:</strong><br>
+                <small style="color: #856404;">{{ token }}</small>
+            </div>
+
+            <div class="data-detail">
+                <h3>{{ data.title }}</h3>
+                <p><strong>ID:</strong> {{ data.id }}</p>
+                <p><strong>Konten:</strong> {{ data.content }}</p>
+            </div>
+
+            <div style="margin-top: 20px;">
+                <a href="{{ url_for('view_data') }}" class="btn btn-primary">← Kembali ke Daftar Data</a>
+            </div>
+        </div>
+    </div>
+</body>
+</html>
+'''
+
+# Log Viewer Template
+LOG_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Log Data - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link">Dashboard</a>
+                
+                {% if session.get('username') == 'admin' %}
+                    <a href="{{ url_for('view_data') }}" class="nav-link">Data Rahasia</a>
+                    <a href="{{ url_for('view_logs') }}" class="nav-link active">Log Data</a>
+                    <a href="{{ url_for('view_security') }}" class="nav-link">Keamanan</a>
+                {% endif %}
+                
+                {% if session.get('username') %}
+                    <span class="user-info-nav">👤 {{ session['username'] }}</span>
+                    <a href="{{ url_for('logout') }}" class="nav-link">Sign Out</a>
+                {% else %}
+                    <a href="{{ url_for('login') }}" class="nav-link">Sign In</a>
+                {% endif %}
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        {% with messages = get_flashed_messages(with_categories=true) %}
+            {% if messages %}
+                {% for category, message in messages %}
+                    <div class="alert alert-{{ category }}">{{ message }}</div>
+                {% endfor %}
+            {% endif %}
+        {% endwith %}
+
+        <div class="content-box">
+            <div class="page-header">
+                <h2>📋 Log Data Sistem</h2>
+                <p>Menampilkan {{ logs|length }} log aktivitas{% if not filters %} terakhir{% endif %}</p>
+            </div>
+
+            <div class="log-info">
+                ℹ️ <strong>Secure #3 - Logging:</strong> Semua aktivitas sistem dicatat secara otomatis untuk keamanan dan audit.
+            </div>
+
+            <form method="get" action="{{ url_for('view_logs') }}" class="log-filter">
+                <label>Level
+                    <select name="level">
+                        <option value="">Semua</option>
+                        {% for level in levels %}
+                        <option value="{{ level }}" {% if request.args.get('level', '').upper() == level %}selected{% endif %}>{{ level }}</option>
+                        {% endfor %}
+                    </select>
+                </label>
+                <label>Dari
+                    <input type="datetime-local" name="since" value="{{ request.args.get('since', '') }}">
+                </label>
+                <label>Sampai
+                    <input type="datetime-local" name="until" value="{{ request.args.get('until', '') }}">
+                </label>
+                <label>Username
+                    <input type="text" name="user" value="{{ request.args.get('user', '') }}">
+                </label>
+                <label>IP
+                    <input type="text" name="ip" value="{{ request.args.get('ip', '') }}">
+                </label>
+                <label>Cari teks
+                    <input type="text" name="text" value="{{ request.args.get('text', '') }}">
+                </label>
+                <button type="submit" class="btn btn-primary">🔍 Filter</button>
+            </form>
+
+            <a href="{{ url_for('view_logs') }}" class="btn btn-primary refresh-btn">🔄 Refresh Log</a>
+            {% if live %}
+            <span id="live-status" class="live-status">⏸ Live: menghubungkan...</span>
+            {% endif %}
+
+            <div class="log-container" id="log-container">
+                {% if logs %}
+                    {% for log in logs %}
+                    <div class="log-line log-level-{{ log.level or 'INFO' }}">
+                        {{ log.line|trim }}
+                    </div>
+                    {% endfor %}
+                {% else %}
+                    <div class="empty-log">
+                        📄 Belum ada log aktivitas.<br>
+                        Silakan melakukan beberapa aktivitas terlebih dahulu.
+                    </div>
+                {% endif %}
+            </div>
+
+            {% if next_cursor is not none %}
+            <div class="log-pager">
+                <a href="{{ url_for('view_logs', **dict(request.args.to_dict(), cursor=next_cursor)) }}" class="btn btn-primary">← Log sebelumnya</a>
+            </div>
+            {% endif %}
+
+            <div style="margin-top: 20px;">
+                <p style="color: #666; font-size: 14px;">
+                    💾 Log disimpan di file: <code>app.log</code> (log lama dikompresi ke <code>app.log.NNNNNN.gz</code>)
+                </p>
+            </div>
+        </div>
+    </div>
+    {% if live %}
+    <script>
+        (function () {
+            var container = document.getElementById('log-container');
+            var status = document.getElementById('live-status');
+            function connect() {
+                var source = new EventSource("{{ url_for('stream_logs') }}");
+                source.onopen = function () { status.textContent = '🟢 Live'; };
+                source.onerror = function () {
+                    status.textContent = '⏸ Live: terputus, mencoba lagi...';
+                    // a busy server answers 503 and the browser stops retrying on its own
+                    if (source.readyState === EventSource.CLOSED) { setTimeout(connect, {{ stream_retry }}); }
+                };
+                source.onmessage = function (event) {
+                    var empty = container.querySelector('.empty-log');
+                    if (empty) { empty.remove(); }
+                    var atBottom = container.scrollTop + container.clientHeight >= container.scrollHeight - 20;
+                    JSON.parse(event.data).forEach(function (entry) {
+                        var line = document.createElement('div');
+                        line.className = 'log-line log-level-' + (entry.level || 'INFO');
+                        line.textContent = entry.line;
+                        container.appendChild(line);
+                    });
+                    while (container.children.length > {{ live_max_lines }}) {
+                        container.removeChild(container.firstElementChild);
+                    }
+                    if (atBottom) { container.scrollTop = container.scrollHeight; }
+                };
+            }
+            connect();
+        })();
+    </script>
+    {% endif %}
+</body>
+</html>
+'''
+
+# Security Alerts Template
+SECURITY_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Keamanan - CCTV Sidoarjo</title>
+    <link rel="stylesheet" href="{{ asset_url('app.css') }}">
+</head>
+<body>
+    <nav class="navbar">
+        <div class="container">
+            <a href="{{ url_for('index') }}" class="navbar-brand">
+                🎥 CCTV<span>Sidoarjo</span>
+            </a>
+            <div class="navbar-menu">
+                <a href="{{ url_for('index') }}" class="nav-link">Dashboard</a>
+                
+                {% if session.get('username') == 'admin' %}
+                    <a href="{{ url_for('view_data') }}" class="nav-link">Data Rahasia</a>
+                    <a href="{{ url_for('view_logs') }}" class="nav-link">Log Data</a>
+                    <a href="{{ url_for('view_security') }}" class="nav-link active">Keamanan</a>
+                {% endif %}
+                
+                {% if session.get('username') %}
+                    <span class="user-info-nav">👤 {{ session['username'] }}</span>
+                    <a href="{{ url_for('logout') }}" class="nav-link">Sign Out</a>
+                {% else %}
+                    <a href="{{ url_for('login') }}" class="nav-link">Sign In</a>
+                {% endif %}
+            </div>
+        </div>
+    </nav>
+    
+    <div class="main-container">
+        <div class="content-box">
+            <div class="page-header">
+                <h2>🚨 Peringatan Keamanan</h2>
+                <p>{{ stats.lines }} kejadian audit diperiksa, {{ stats.events }} mencurigakan, {{ stats.alerts_raised }} peringatan</p>
+            </div>
+
+            <div class="log-info">
+                ℹ️ <strong>Secure #3 - Deteksi:</strong> Audit trail (<code>audit.jsonl</code>) dipantau terus-menerus. Peringatan muncul bila login gagal,
+                token tidak valid atau akses ditolak dari satu user/IP melewati batas dalam {{ stats.window // 60 }} menit.
+            </div>
+
+            <a href="{{ url_for('view_security') }}" class="btn btn-primary refresh-btn">🔄 Refresh</a>
+
+            {% for alert in alerts %}
+            <div class="data-item{% if alert.active %} security-alert-active{% endif %}">
+                <h3>{% if alert.active %}🔴{% else %}⚪{% endif %} {{ alert.description }}</h3>
+                <p>
+                    {{ 'Username' if alert.field == 'user' else 'IP' }}: <strong>{{ alert.key }}</strong>
+                    &middot; {{ alert.count }} kejadian (batas {{ alert.limit }})
+                    &middot; {{ alert.first }} s/d {{ alert.last }}
+                    &middot; <code>{{ alert.rule }}</code>
+                </p>
+            </div>
+            {% else %}
+            <div class="empty-log">
+                ✅ Belum ada peringatan keamanan.
+            </div>
+            {% endfor %}
+        </div>
+    </div>
+</body>
+</html>
+'''
+
+# Template registry. The routes render these by name; Jinja compiles each one
+# on first use and keeps it in the environment's cache. preload_templates()
+# compiles them all up front, which the production server does before
+# forking its workers. With
+# TEMPLATE_PRECOMPILE_DIR set, the templates are compiled ahead of time into
+# Python modules in that directory (recompiled only when a source changes),
+# so new workers import them instead of compiling.
+TEMPLATES = {
+    'dashboard.html': DASHBOARD_TEMPLATE,
+    'cctv_grid.html': CCTV_GRID_TEMPLATE,
+    'login.html': LOGIN_TEMPLATE,
+    'data.html': DATA_TEMPLATE,
+    'detail.html': DETAIL_TEMPLATE,
+    'logs.html': LOG_TEMPLATE,
+    'security.html': SECURITY_TEMPLATE
+}
+TEMPLATE_PRECOMPILE_DIR = os.environ.get('TEMPLATE_PRECOMPILE_DIR')
+
+def template_loader(app, precompile_dir=TEMPLATE_PRECOMPILE_DIR):
+    source_loader = DictLoader(TEMPLATES)
+    if not precompile_dir:
+        return source_loader
+    digest = hashlib.sha256(json.dumps(TEMPLATES, sort_keys=True).encode()).hexdigest()
+    stamp = os.path.join(precompile_dir, 'templates.sha256')
+    try:
+        with open(stamp) as f:
+            current = f.read() == digest
+    except OSError:
+        current = False
+    if not current:
+        env = app.jinja_env.overlay(loader=source_loader)
+        env.compile_templates(precompile_dir, zip=None)
+        with open(stamp, 'w') as f:
+            f.write(digest)
+    return ChoiceLoader([ModuleLoader(precompile_dir), source_loader])
+
+def preload_templates(app):
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import threading
+import hmac
+import time
+import os
+
+from itsdangerous import URLSafeTimedSerializer, TimestampSigner
+from itsdangerous.encoding import base64_encode, int_to_bytes, want_bytes
+
+from .extensions import subsystem
+
+# Secure #1: Token Configuration
+TOKEN_SALT = 'url-safe-token'
+TOKEN_MAX_AGE = 3600
+# A token minted within the same bucket is handed out again instead of being
+# re-signed, so every URL stays valid for at least TOKEN_MAX_AGE minus one bucket
+TOKEN_BUCKET_SECONDS = int(os.environ.get('TOKEN_BUCKET_SECONDS', 300))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 100000))
+VERIFY_CACHE_SIZE = int(os.environ.get('VERIFY_CACHE_SIZE', 10000))
+
+# Secure #1: itsdangerous derives the signing key from the secret and salt on
+# every dumps/loads; the result never changes, so it is derived once per
+# (secret, salt) and reused
+class CachedKeySigner(TimestampSigner):
+    _derived_keys = {}
+
+    def derive_key(self, secret_key=None):
+        secret = self.secret_keys[-1] if secret_key is None else secret_key
+        cache_key = (secret, self.salt, self.key_derivation, self.digest_method)
+        key = self._derived_keys.get(cache_key)
+        if key is None:
+            key = self._derived_keys[cache_key] = super().derive_key(secret_key)
+        return key
+
+    # Same output as sign() for each value, with one timestamp for the batch.
+    # The keyed HMAC is built once and copied for every value.
+    def sign_batch(self, values):
+        timestamp = base64_encode(int_to_bytes(self.get_timestamp()))
+        sep = want_bytes(self.sep)
+        keyed = hmac.new(self.derive_key(), digestmod=self.digest_method)
+        signed = []
+        for value in values:
+            value = want_bytes(value) + sep + timestamp
+            mac = keyed.copy()
+            mac.update(value)
+            signed.append(value + sep + base64_encode(mac.digest()))
+        return signed
+
+# Secure #1: URL tokens for one secret key, with the minted and verified caches
+class TokenService:
+    def __init__(self, secret_key):
+        self.serializer = URLSafeTimedSerializer(secret_key, signer=CachedKeySigner)
+        # Minted tokens keyed on (id, bucket), oldest bucket first
+        self.minted = OrderedDict()
+        self.minted_lock = threading.Lock()
+        # Tokens that passed verification: token -> (payload, signing time),
+        # least recently used first. Only valid tokens are cached.
+        self.verified = OrderedDict()
+        self.verified_lock = threading.Lock()
+        self.verify_stats = {'hits': 0, 'misses': 0, 'expired': 0}
+
+    # Mint tokens for many ids at once, one keyed HMAC for the whole batch
+    def generate(self, ids):
+        bucket = int(time.time() // TOKEN_BUCKET_SECONDS)
+        tokens = {}
+        missing = []
+        with self.minted_lock:
+            # Tokens from past buckets are never handed out again
+            while self.minted and next(iter(self.minted))[1] < bucket:
+                self.minted.popitem(last=False)
+            for data_id in ids:
+                token = self.minted.get((data_id, bucket))
+                if token is None:
+                    missing.append(data_id)
+                else:
+                    tokens[data_id] = token
+        if missing:
+            signer = self.serializer.make_signer(TOKEN_SALT)
+            signed = signer.sign_batch([self.serializer.dump_payload(data_id) for data_id in missing])
+            minted = {data_id: token.decode('utf-8') for data_id, token in zip(missing, signed)}
+            tokens.update(minted)
+            with self.minted_lock:
+                for data_id, token in minted.items():
+                    self.minted[(data_id, bucket)] = token
+                while len(self.minted) > TOKEN_CACHE_SIZE:
+                    self.minted.popitem(last=False)
+        return tokens
+
+    def verify(self, token, max_age=TOKEN_MAX_AGE):
+        # Same age rule as itsdangerous: whole seconds, expired once age > max_age
+        now = int(time.time())
+        with self.verified_lock:
+            cached = self.verified.get(token)
+            if cached is not None:
+                data, signed_at = cached
+                if 0 <= now - signed_at <= max_age:
+                    self.verified.move_to_end(token)
+                    self.verify_stats['hits'] += 1
+                    return data
+                del self.verified[token]
+                self.verify_stats['expired'] += 1
+            self.verify_stats['misses'] += 1
+        try:
+            data, signed_at = self.serializer.loads(token, salt=TOKEN_SALT, max_age=max_age,
+                                                    return_timestamp=True)
+        except:
+            return None
+        with self.verified_lock:
+            self.verified[token] = (data, int(signed_at.timestamp()))
+            while len(self.verified) > VERIFY_CACHE_SIZE:
+                self.verified.popitem(last=False)
+        return data
+
+    def stats(self):
+        with self.minted_lock:
+            minted = len(self.minted)
+        with self.verified_lock:
+            return dict(self.verify_stats, verified=len(self.verified), minted=minted)
+
+def get_token_service():
+    return subsystem('tokens', lambda app: TokenService(app.secret_key))
+
+# Secure #1: Generate safe token for URL
+def generate_token(data):
+    return generate_tokens([data])[data]
+
+def generate_tokens(ids):
+    return get_token_service().generate(ids)
+
+# Secure #1: Verify token from URL
+def verify_token(token, max_age=TOKEN_MAX_AGE):
+    return get_token_service().verify(token, max_age)
+
+def token_cache_stats():
+    return get_token_service().stats()
@@ -0,0 +1,388 @@
+import hashlib
+import hmac
+import time
+
+from flask import Response, abort, current_app, flash, g, jsonify, redirect, render_template, request, \
+    session, stream_with_context, url_for
+from markupsafe import Markup
+
+from .assets import ASSET_MAX_AGE, get_asset_files, template_version
+from .audit import audit, audit_logger
+from .extensions import subsystem
+from .auth import admin_required, get_login_attempts, login_required, login_throttled, verify_password
+from .cctv import CCTV_INGEST_MAX_BYTES, CCTV_INGEST_TYPES, StatusEventStream, get_cctv_registry, get_status_feed, \
+    read_heartbeats
+from .data import DATA_PAGE_MAX, DATA_PAGE_SIZE, DATA_STREAM_BUFFER, get_data_store, iter_data_records
+from .log_viewer import LOG_LEVELS, LogEventStream, get_log_follower, log_filters_from_request, log_tail_state, \
+    query_logs
+from .logs import LOG_PAGE_MAX, flush_log, log_pipeline_stats, log_value
+from .responses import COMPRESS_MIMETYPES, COMPRESS_MIN_SIZE, compress_body, negotiate_encoding, \
+    representation_etag
+from .security import get_security_detector, watch_security_log
+from .sessions import ServerSessionInterface
+from .streams import STREAM_RETRY_SECONDS, StreamSlots
+from .tokens import generate_token, generate_tokens, token_cache_stats, verify_token
+
+DATA_PAGE_ETAG_SECONDS = 300
+SECURITY_PAGE_SIZE = 200
+
+# Pages also depend on the signed-in user and on the template sources
+def page_etag(*parts):
+    parts = (template_version(), session.get('username')) + parts
+    return representation_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+# Returns a 304 response if the client already has this version of the page,
+# otherwise remembers the ETag for the response and returns None. Pages with
+# pending flash messages are always rendered.
+def not_modified(*parts):
+    if session.get('_flashes'):
+        return None
+    g.etag = page_etag(*parts)
+    if request.if_none_match.contains(g.etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(g.etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.update(('Cookie', 'Accept-Encoding'))
+        return response
+    return None
+
+# Render a template as a stream of HTML, flushed every DATA_STREAM_BUFFER
+# template chunks
+def stream_page(name, **context):
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(name).stream(context)
+    stream.enable_buffering(DATA_STREAM_BUFFER)
+    return current_app.response_class(stream_with_context(stream), mimetype='text/html')
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def compress_response(response):
+    etag = g.pop('etag', None)
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def write_audit_events(response):
+    events = g.pop('audit_events', None)
+    if events:
+        latency = round((time.perf_counter() - g.request_started) * 1000, 3)
+        for event in events:
+            event['latency'] = latency
+            audit_logger.info(event['event'], extra={'audit': event})
+    return response
+
+def index():
+    current_app.logger.info(f'Dashboard accessed - IP: {request.remote_addr}' + (f' - User: {session["username"]}' if 'username' in session else ' - Guest'))
+    audit('dashboard_view')
+    registry = get_cctv_registry()
+    registry.expire_heartbeats()
+    cached = not_modified('dashboard', registry.version, request.query_string)
+    if cached is not None:
+        return cached
+    
+    counts = registry.counts()
+    # ?status=Offline and/or ?region=Waru narrow the grid through the registry indexes
+    grid_filter = {key: request.args[key] for key in ('status', 'region') if request.args.get(key)}
+    if grid_filter:
+        cctv_grid = Markup(render_template('cctv_grid.html', cctv_list=registry.find(**grid_filter)))
+    else:
+        cctv_grid = registry.render_grid(lambda cameras: render_template('cctv_grid.html', cctv_list=cameras))
+    
+    return render_template(
+        'dashboard.html',
+        cctv_grid=cctv_grid,
+        grid_filter=grid_filter,
+        regions=registry.region_counts(),
+        version=registry.version,
+        total_cctv=counts['total'],
+        online_cctv=counts['online'],
+        offline_cctv=counts['offline']
+    )
+
+def asset(filename):
+    asset = get_asset_files().get(filename)
+    if asset is None:
+        abort(404)
+    encoding = negotiate_encoding()
+    response = Response(asset['encoded'][encoding], mimetype=asset['mimetype'])
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(representation_etag(asset['etag']))
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        current_app.logger.info(f'Login attempt - Username: {log_value(username)} - IP: {request.remote_addr}')
+        
+        retry_after = login_throttled(request.remote_addr, username)
+        if retry_after:
+            current_app.logger.warning(f'Login throttled - Username: {log_value(username)} - IP: {request.remote_addr}')
+            audit('login', 'throttled', user=username)
+            flash('Terlalu banyak percobaan login. Silakan coba lagi nanti.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+        get_login_attempts().add(f'ip:{request.remote_addr}')
+
+        valid = verify_password(username, password)
+        if valid is None:
+            current_app.logger.warning(f'Login deferred, verification pool busy - Username: {log_value(username)} - IP: {request.remote_addr}')
+            audit('login', 'busy', user=username)
+            flash('Server sedang sibuk, silakan coba lagi.', 'danger')
+            return render_template('login.html'), 503
+        if valid:
+            session.rotate = True
+            session['username'] = username
+            current_app.logger.info(f'Login successful - Username: {log_value(username)}')
+            audit('login', user=username)
+            flash('Login berhasil! Selamat datang.', 'success')
+            return redirect(url_for('index'))
+        else:
+            current_app.logger.warning(f'Login failed - Username: {log_value(username)} - IP: {request.remote_addr}')
+            get_login_attempts().add(f'user:{username}')
+            audit('login', 'failure', user=username)
+            flash('Username atau password salah!', 'danger')
+    
+    cached = not_modified('login')
+    if cached is not None:
+        return cached
+    return render_template('login.html')
+
+def logout():
+    username = session.get('username', 'Unknown')
+    if isinstance(current_app.session_interface, ServerSessionInterface):
+        current_app.session_interface.revoke(session)
+    else:
+        session.pop('username', None)
+    current_app.logger.info(f'User logged out - Username: {username}')
+    audit('logout', user=username)
+    flash('Anda telah logout.', 'info')
+    return redirect(url_for('index'))
+
+@login_required
+def view_data():
+    current_app.logger.info(f'Data page accessed - User: {session["username"]}')
+    audit('data_list')
+    # the page embeds signed links, so it is re-rendered at least every DATA_PAGE_ETAG_SECONDS
+    try:
+        after = int(request.args['after']) if request.args.get('after') else None
+        limit = min(max(int(request.args.get('limit') or DATA_PAGE_SIZE), 1), DATA_PAGE_MAX)
+    except ValueError:
+        abort(400)
+    data_store = get_data_store()
+    cached = not_modified('data', int(time.time() // DATA_PAGE_ETAG_SECONDS), data_store.version,
+                          request.query_string)
+    if cached is not None:
+        return cached
+    if request.args.get('stream'):
+        # ?stream=1 lists everything after the cursor, rows flushed as they are rendered
+        return stream_page('data.html', data_list=iter_data_records(after), next_cursor=None,
+                           generate_token=generate_token)
+    records = data_store.list(after, limit + 1)
+    next_cursor = records[limit - 1]['id'] if len(records) > limit else None
+    generate_tokens([record['id'] for record in records[:limit]])
+    return render_template('data.html', data_list=records[:limit], next_cursor=next_cursor,
+                           generate_token=generate_token)
+
+@login_required
+def view_detail(token):
+    data_id = verify_token(token)
+    
+    if data_id is None:
+        current_app.logger.warning(f'Invalid token access - User: {session["username"]} - Token: {log_value(token[:20])}...')
+        audit('data_detail', 'invalid_token')
+        flash('Token tidak valid atau sudah kadaluarsa!', 'danger')
+        return redirect(url_for('view_data'))
+    
+    data_store = get_data_store()
+    data = data_store.get(data_id)
+    
+    if data is None:
+        current_app.logger.warning(f'Data not found - ID: {data_id} - User: {session["username"]}')
+        audit('data_detail', 'not_found', data_id=data_id)
+        flash('Data tidak ditemukan!', 'danger')
+        return redirect(url_for('view_data'))
+    
+    current_app.logger.info(f'Data detail accessed - ID: {data_id} - User: {session["username"]}')
+    audit('data_detail', data_id=data_id)
+    cached = not_modified('detail', token, data_store.version)
+    if cached is not None:
+        return cached
+    return render_template('detail.html', data=data, token=token)
+
+@login_required
+def view_logs():
+    audit('log_view')
+    access = f'Log viewer accessed - User: {session["username"]}'
+    current_app.logger.info(access)
+    try:
+        filters = log_filters_from_request()
+    except ValueError:
+        flash('Filter log tidak valid!', 'danger')
+        return redirect(url_for('view_logs'))
+    # pages before a cursor only show history, which never changes; the
+    # newest page changes whenever the log grows. Like every page it logs
+    # each access, 304s included, so its ETag leaves out the requester's own
+    # access lines at the end of the log and polling an unchanged page still
+    # gets a 304.
+    state = None
+    if 'before' not in filters:
+        flush_log()
+        state = log_tail_state(skip=access)
+    cached = not_modified('logs', request.query_string, state)
+    if cached is not None:
+        return cached
+    logs, next_cursor = query_logs(**filters)
+    active = {k: v for k, v in filters.items() if k not in ('before', 'limit')}
+    # only the newest unfiltered page follows the log live
+    live = not active and 'before' not in filters
+    return render_template('logs.html', logs=logs, next_cursor=next_cursor,
+                           filters=active, levels=LOG_LEVELS, live=live,
+                           live_max_lines=LOG_PAGE_MAX)
+
+@login_required
+def api_logs():
+    try:
+        filters = log_filters_from_request()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    logs, next_cursor = query_logs(**filters)
+    return jsonify(entries=logs, next_cursor=next_cursor)
+
+# Server-sent events. The body is an EventStream, passed through unencoded
+# and uncompressed, which the ASGI mode reads on its event loop. Under a
+# WSGI server the stream holds a worker thread, so it needs one of the
+# process's STREAM_THREAD_LIMIT slots.
+def event_stream_response(stream):
+    limit = current_app.config['STREAM_THREAD_LIMIT']
+    if limit is not None and not request.environ.get('secure_web.loop_streams'):
+        slots = subsystem('stream_slots', lambda app: StreamSlots(limit))
+        if not slots.acquire():
+            current_app.logger.warning(f'Stream refused, all {limit} stream threads busy - IP: {request.remote_addr}')
+            return Response(f'retry: {STREAM_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'Retry-After': str(STREAM_RETRY_SECONDS)})
+        stream.slots = slots
+    return Response(stream, mimetype='text/event-stream', direct_passthrough=True,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@login_required
+def stream_logs():
+    current_app.logger.info(f'Log stream opened - User: {session["username"]}')
+    audit('log_stream')
+    return event_stream_response(LogEventStream(get_log_follower()))
+
+# Live dashboard deltas, patched into the page it was rendered from
+def stream_cctv():
+    current_app.logger.info(f'Dashboard stream opened - IP: {request.remote_addr}')
+    audit('cctv_stream')
+    feed = get_status_feed()
+    feed.registry.expire_heartbeats()
+    # a reconnecting browser sends the version of the last delta it applied
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    return event_stream_response(StatusEventStream(feed, since=since))
+
+@login_required
+def api_log_stats():
+    return jsonify(log_pipeline_stats())
+
+@login_required
+def api_token_stats():
+    return jsonify(token_cache_stats())
+
+# Secure #3: Alerts raised by the security-event detector
+@admin_required
+def view_security():
+    current_app.logger.info(f'Security alerts accessed - User: {session["username"]}')
+    audit('security_view')
+    detector = get_security_detector()
+    return render_template('security.html', alerts=detector.recent_alerts(SECURITY_PAGE_SIZE),
+                           stats=detector.stats())
+
+@admin_required
+def api_security_alerts():
+    detector = get_security_detector()
+    return jsonify(alerts=detector.recent_alerts(), stats=detector.stats())
+
+@login_required
+def api_cctv():
+    registry = get_cctv_registry()
+    registry.expire_heartbeats()
+    filters = {key: request.args[key] for key in ('status', 'region', 'location') if request.args.get(key)}
+    return jsonify(cameras=[camera.to_dict() for camera in registry.find(**filters)],
+                   counts=registry.counts(), heartbeat_timeout=registry.heartbeat_timeout)
+
+@login_required
+def api_cctv_camera(camera_id):
+    registry = get_cctv_registry()
+    registry.expire_heartbeats()
+    camera = registry.get(camera_id)
+    if camera is None:
+        return jsonify(error=f'Unknown camera: {camera_id}'), 404
+    return jsonify(camera.to_dict())
+
+# Bulk heartbeat ingest for the camera gateway: one request carries the
+# heartbeats of many cameras (NDJSON, or msgpack when installed) and they are
+# applied to the registry in one pass. Authenticated with a bearer token
+# rather than the login session.
+def ingest_heartbeats():
+    expected = current_app.config['CCTV_INGEST_TOKEN']
+    auth = request.authorization
+    supplied = auth.token if auth is not None and auth.type == 'bearer' else None
+    if not expected or not supplied or not hmac.compare_digest(supplied.encode(), expected.encode()):
+        current_app.logger.warning(f'Heartbeat ingest rejected - IP: {request.remote_addr}')
+        audit('cctv_ingest', 'denied')
+        return jsonify(error='Invalid or missing bearer token'), 401, {'WWW-Authenticate': 'Bearer'}
+    if request.mimetype not in CCTV_INGEST_TYPES:
+        return jsonify(error=f'Content-Type must be one of: {", ".join(CCTV_INGEST_TYPES)}'), 415
+    request.max_content_length = CCTV_INGEST_MAX_BYTES
+    try:
+        beats, invalid = read_heartbeats(request.stream, request.mimetype)
+    except ValueError:
+        return jsonify(error='Malformed msgpack body'), 400
+    result = get_cctv_registry().apply_heartbeats(beats)
+    result['invalid'] = invalid
+    current_app.logger.info(f'Heartbeats ingested - Accepted: {result["accepted"]} - Unknown: {result["unknown"]} '
+                            f'- Invalid: {invalid} - Changed: {result["changed"]} - IP: {request.remote_addr}')
+    audit('cctv_ingest')
+    return jsonify(result)
+
+def register_routes(app):
+    app.before_request(start_request_timer)
+    app.before_request(watch_security_log)
+    app.after_request(compress_response)
+    app.after_request(write_audit_events)
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/assets/<filename>', view_func=asset)
+    app.add_url_rule('/login', view_func=login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', view_func=logout)
+    app.add_url_rule('/data', view_func=view_data)
+    app.add_url_rule('/data/detail/<token>', view_func=view_detail)
+    app.add_url_rule('/logs', view_func=view_logs)
+    app.add_url_rule('/api/logs', view_func=api_logs)
+    app.add_url_rule('/logs/stream', view_func=stream_logs)
+    app.add_url_rule('/api/logs/stats', view_func=api_log_stats)
+    app.add_url_rule('/api/tokens/stats', view_func=api_token_stats)
+    app.add_url_rule('/security', view_func=view_security)
+    app.add_url_rule('/api/security/alerts', view_func=api_security_alerts)
+    app.add_url_rule('/cctv/stream', view_func=stream_cctv)
+    app.add_url_rule('/api/cctv', view_func=api_cctv)
+    app.add_url_rule('/api/cctv/<int:camera_id>', view_func=api_cctv_camera)
+    app.add_url_rule('/api/cctv/heartbeats', view_func=ingest_heartbeats, methods=['POST'])
@@ -0,0 +1,17 @@
+# WSGI entry point for an external server. The module doubles as the gunicorn
+# config, which adds the SIGHUP log reopen:
+#   gunicorn -c python:wsgi wsgi:application
+from secure_web import create_app
+from secure_web import server
+
+application = server.create_wsgi_app(create_app())
+
+bind = f'{server.SERVER_HOST}:{server.SERVER_PORT}'
+workers = server.SERVER_WORKERS
+threads = server.SERVER_THREADS
+worker_class = 'gthread'
+preload_app = True
+graceful_timeout = server.SERVER_GRACEFUL_TIMEOUT
+
+def on_reload(arbiter):
+    server.reopen_log_files()